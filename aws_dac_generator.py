@@ -1,17 +1,7 @@
-from dis import disco
-
-from diagrams import Diagram, Cluster
-from diagrams.aws.compute import EC2, EC2Instance, EC2Instances, Lambda
-from diagrams.aws.database import Database, ElasticacheForRedis, ElasticacheForMemcached, RDSInstance
-from diagrams.aws.general import Users
-from diagrams.aws.integration import SimpleQueueServiceSqs, SimpleNotificationServiceSns
-from diagrams.aws.management import Cloudtrail
-from diagrams.aws.network import NetworkingAndContentDelivery, VPC, ElasticLoadBalancing, CloudFront
-from diagrams.aws.storage import SimpleStorageServiceS3
-from diagrams.gcp.network import VirtualPrivateCloud
-from diagrams.generic.network import Subnet
-from diagrams.onprem.client import Client
-from diagrams.onprem.compute import Server
+import os
+import subprocess
+
+from discovery_model import AwsService, as_discovery
 
 
 # with Diagram("Diagram", direction="TB"):
@@ -26,6 +16,11 @@ from diagrams.onprem.compute import Server
 
 
 def test_diagram():
+    from diagrams import Diagram
+    from diagrams.aws.compute import EC2
+    from diagrams.aws.network import NetworkingAndContentDelivery, VPC
+    from diagrams.generic.network import Subnet
+
     with Diagram("AWS Infrastructure", show=False):
         # Create a Region
         vpc = VPC("My VPC")
@@ -42,72 +37,171 @@ def test_diagram():
         vpc >> subnet1 >> ec2_1
         vpc >> subnet2 >> ec2_2
 
-def generate_architecture_diagram(customerA_discovery, customerB_discovery):
-    from main import Services
-    for customer, discovery in {"CustomerA": customerA_discovery, "CustomerB": customerB_discovery}.items():
-        #continue
-        with Diagram(f"AWS Architecture - {customer}", filename=f"/tmp/diagrams/{customer}", show=False, direction="LR"):
-            client = Client("Client")
-            cdn = None
-            app_server = discovery.get(Services.APP_SERVER) or discovery.get(Services.DOCKER, {}).get(Services.APP_SERVER)
-            ec2_object = None
-            with Cluster("AWS") as aws_cluster:
-                if discovery.get(Services.STATIC_CONTENT) == 'enabled':
-                    cdn = CloudFront("Content Delivery")
-                if elb_detail := discovery.get(Services.LOAD_BALANCER):
-                    elb = ElasticLoadBalancing("Application LB")
-                    if cdn:
-                        cdn >> elb
-
-                    if elb:
-                        with Cluster("EC2 instance"):
-                            ec2_instances = EC2Instances(f"EC2 {" ".join(elb_detail.get("servers", ""))}")
-                            if app_server:
-                                Server(app_server)
-                            if cdn:
-                                Server("Webserver")
-                            ec2_object =  ec2_instances
-                            elb >> ec2_instances
-                else:
-                    ec2 = EC2("EC2")
-                    ec2_object= ec2
-                    if app_server:
-                        Server(app_server)
-                    if cdn:
-                        Server("WebServer")
-                    prev_element = cdn or client
-                    prev_element >> ec2
-
-            database = discovery.get(Services.DATABASE, [])
-            db_objects = []
-            for db in database:
-                db_obj = Database(db)
-                db_objects.append(db_obj)
-
-            ec2_links = db_objects
-            if discovered_caches := discovery.get(Services.CACHE) :
-                for cache_obj in  discovered_caches:
-                    if cache_obj == 'redis':
-                        cached_diag_obj = ElasticacheForRedis("Redis")
-                    else:
-                        cached_diag_obj = ElasticacheForMemcached("Other Cache")
-                if discovery.get(Services.AWS_SQS) == 'enabled':
-                    ec2_links.append(SimpleQueueServiceSqs("SQS Messaging"))
-                if discovery.get(Services.AWS_SNS) == 'enabled':
-                    ec2_links.append(SimpleNotificationServiceSns("SNS messaging"))
-                if discovery.get(Services.AWS_S3) == 'enabled':
-                    ec2_links.append(SimpleStorageServiceS3("S3"))
-                if discovery.get(Services.AWS_LAMBDA) == 'enabled':
-                    ec2_links.append(Lambda("Lambda"))
-                if discovery.get(Services.AWS_CLOUDTRAIL) == 'enabled':
-                    ec2_links.append(Cloudtrail("Cloudtrail"))
-
-                ec2_links.append(cached_diag_obj)
-            ec2_object >> ec2_links
-            client >> (cdn or elb)
+# Bump whenever render_diagram draws differently, so cached diagrams are rendered again
+RENDERER_VERSION = 3
+
 
+def generate_architecture_diagram(customerA_discovery, customerB_discovery, output_dir="/tmp/diagrams", render_cache=None,
+                                  outformat="png"):
+    futures = render_diagrams({"CustomerA": customerA_discovery, "CustomerB": customerB_discovery}, output_dir,
+                              outformat, render_cache=render_cache)
+    for future in futures.values():
+        future.result()
     print("Diagram generated")
 
+
+def render_diagrams(discoveries, output_dir="/tmp/diagrams", outformats="png", executor=None, render_cache=None,
+                    layout="graphviz"):
+    """Render {customer: discovery} side by side on a process pool.
+
+    Returns {customer: future} right away; each future resolves to {format: path} under output_dir.
+    """
+    if executor is None:
+        executor = default_render_executor()
+    os.makedirs(output_dir, exist_ok=True)
+    futures = {}
+    for customer, discovery in discoveries.items():
+        filename = os.path.join(output_dir, customer)
+        if render_cache is None:
+            futures[customer] = executor.submit(render_diagram, customer, discovery, filename, outformats, layout)
+        else:
+            futures[customer] = render_cache.submit(executor, customer, discovery, outformats, filename, layout)
+    return futures
+
+
+_render_executor = None
+
+
+def default_render_executor():
+    global _render_executor
+    if _render_executor is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn, not fork: callers such as the job service render from threads
+        _render_executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+    return _render_executor
+
+
+def render_diagram(customer, discovery, filename, outformat="png", layout="graphviz"):
+    """Render one customer's architecture to filename.<format> for each of outformat (a format or a list).
+
+    With the graphviz layout the graph is laid out once: a single dot run writes every format.
+    The precomputed layout writes svg (and unlaid-out dot source) without running graphviz at all.
+    Returns {format: path}.
+    """
+    import dot_renderer
+    outformats = [outformat] if isinstance(outformat, str) else list(outformat)
+    if layout == "precomputed":
+        writers = {"svg": dot_renderer.architecture_svg, "dot": dot_renderer.architecture_dot}
+        if unsupported := set(outformats) - set(writers):
+            raise ValueError(f"The precomputed layout only writes {' and '.join(writers)}, not {', '.join(unsupported)}")
+        paths = {}
+        for one_format in outformats:
+            paths[one_format] = f"{filename}.{one_format}"
+            with open(paths[one_format], "w", encoding="utf-8") as file:
+                file.write(writers[one_format](customer, discovery))
+        return paths
+    command = ["dot", "-Kdot"]
+    paths = {}
+    for one_format in outformats:
+        paths[one_format] = f"{filename}.{one_format}"
+        command += [f"-T{one_format}", "-o", paths[one_format]]
+    try:
+        subprocess.run(command, input=dot_renderer.architecture_dot(customer, discovery), text=True, capture_output=True,
+                       check=True)
+    except FileNotFoundError:
+        raise RuntimeError("Graphviz dot executable not found; make sure Graphviz is on your PATH")
+    except subprocess.CalledProcessError as cpe:
+        raise RuntimeError(f"dot failed for {customer}: {cpe.stderr.strip()}")
+    return paths
+
+
+def diagram_source(customer, discovery):
+    """DOT source of one customer's architecture, built with diagrams but not rendered.
+
+    render_diagram uses dot_renderer.architecture_dot, which draws the same graph without the
+    diagrams object graph; this stays as its reference.
+    """
+    # diagrams pulls in graphviz; only load it when actually rendering
+    from diagrams import Diagram, Cluster, setdiagram
+    from diagrams.aws.compute import EC2, EC2Instances, Lambda
+    from diagrams.aws.database import Database, ElasticacheForRedis, ElasticacheForMemcached
+    from diagrams.aws.integration import SimpleQueueServiceSqs, SimpleNotificationServiceSns
+    from diagrams.aws.management import Cloudtrail
+    from diagrams.aws.network import ElasticLoadBalancing, CloudFront
+    from diagrams.aws.storage import SimpleStorageServiceS3
+    from diagrams.onprem.client import Client
+    from diagrams.onprem.compute import Server
+
+    discovery = as_discovery(discovery)
+
+    class SourceDiagram(Diagram):
+        # Diagram renders (one dot run per format) on exit; render_diagram runs dot itself
+        def __exit__(self, exc_type, exc_value, traceback):
+            setdiagram(None)
+
+    with SourceDiagram(f"AWS Architecture - {customer}", show=False, direction="LR") as diagram:
+        client = Client("Client")
+        cdn = None
+        app_server = discovery.any_app_server
+        ec2_object = None
+        with Cluster("AWS") as aws_cluster:
+            if discovery.static_content:
+                cdn = CloudFront("Content Delivery")
+            if discovery.lb_servers is not None:
+                elb = ElasticLoadBalancing("Application LB")
+                if cdn:
+                    cdn >> elb
+
+                if elb:
+                    with Cluster("EC2 instance"):
+                        ec2_instances = EC2Instances(f"EC2 {" ".join(discovery.lb_servers)}")
+                        if app_server:
+                            Server(app_server)
+                        if cdn:
+                            Server("Webserver")
+                        ec2_object =  ec2_instances
+                        elb >> ec2_instances
+            else:
+                ec2 = EC2("EC2")
+                ec2_object= ec2
+                if app_server:
+                    Server(app_server)
+                if cdn:
+                    Server("WebServer")
+                prev_element = cdn or client
+                prev_element >> ec2
+
+        database = sorted(discovery.databases)
+        db_objects = []
+        for db in database:
+            db_obj = Database(db)
+            db_objects.append(db_obj)
+
+        ec2_links = db_objects
+        if discovered_caches := sorted(discovery.caches) :
+            for cache_obj in  discovered_caches:
+                if cache_obj == 'redis':
+                    cached_diag_obj = ElasticacheForRedis("Redis")
+                else:
+                    cached_diag_obj = ElasticacheForMemcached("Other Cache")
+            if AwsService.SQS in discovery.aws_services:
+                ec2_links.append(SimpleQueueServiceSqs("SQS Messaging"))
+            if AwsService.SNS in discovery.aws_services:
+                ec2_links.append(SimpleNotificationServiceSns("SNS messaging"))
+            if AwsService.S3 in discovery.aws_services:
+                ec2_links.append(SimpleStorageServiceS3("S3"))
+            if AwsService.LAMBDA in discovery.aws_services:
+                ec2_links.append(Lambda("Lambda"))
+            if AwsService.CLOUDTRAIL in discovery.aws_services:
+                ec2_links.append(Cloudtrail("Cloudtrail"))
+
+            ec2_links.append(cached_diag_obj)
+        ec2_object >> ec2_links
+        client >> (cdn or elb)
+    return diagram.dot.source
+
+
 if __name__ == '__main__':
     generate_architecture_diagram({}, {})
     #test_diagram()
\ No newline at end of file
@@ -0,0 +1,259 @@
+"""Headless discovery of many repositories, one JSON record per repository on stdout.
+
+    python batch_discovery.py --manifest repos.jsonl --workers 16 --timeout 600 --checkpoint done.jsonl
+
+A manifest holds one JSON object per line with the repository "url" (or "repo") and optionally the
+"customer" (or "id"/"request_id") it belongs to; "-" reads the manifest from stdin. Repositories can
+also be given as CUSTOMER=URL arguments. Progress messages go to stderr so stdout stays valid JSONL.
+With --parquet DIR the results, with the file each finding came from, are also appended to a
+columnar_export Parquet dataset.
+"""
+import argparse
+import collections
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+DEFAULT_CLONE_WORKERS = 8
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 1
+
+
+def _clone(customer, url, fast):
+    from discovery import clone_repo, make_workdir
+    workdir = make_workdir(customer)
+    try:
+        clone_repo(url, os.path.join(workdir, "repo"), fast=fast)
+    except Exception:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+    return workdir
+
+
+def _discover(workdir, record_files=False):
+    from git import Repo
+    from discovery import Githubdisovery
+    repo_directory = os.path.join(workdir, "repo")
+    discovery = Githubdisovery(record_files=record_files)
+    discovery.discover_services_in_repo(repo_directory)
+    return {"services_discovered": discovery.services_discovered, "commit": Repo(repo_directory).head.commit.hexsha,
+            "file_fragments": discovery.file_fragments}
+
+
+def _init_quiet_worker():
+    # discovery reports progress with print; keep it off the stdout records are streamed to
+    sys.stdout = sys.stderr
+
+
+def _remove_workdir(future):
+    if not future.cancelled() and future.exception() is None and isinstance(future.result(), str):
+        shutil.rmtree(future.result(), ignore_errors=True)
+
+
+def discover_batch(repos, clone_workers=DEFAULT_CLONE_WORKERS, parse_workers=DEFAULT_PARSE_WORKERS, fast=True,
+                   timeout=None, record_files=False):
+    """Discover services for (customer, url) pairs, yielding one result dict per repo as it completes.
+
+    Clones overlap in a thread pool; parsing runs in a process pool. repos is consumed lazily and only
+    a bounded number of repos is cloned ahead of the parsers, so checkouts never pile up on disk.
+    A repo whose clone and parse run for longer than timeout seconds, not counting the time its
+    checkout waits for a parse worker, is reported as failed. Its clone or parse keeps its worker
+    until it finishes in the background, and its checkout is removed then. With record_files,
+    results carry the file_fragments each file contributed.
+    """
+    # spawn, not fork: the parent has clone threads running
+    mp_context = multiprocessing.get_context("spawn")
+    clone_pool = ThreadPoolExecutor(clone_workers)
+    parse_pool = ProcessPoolExecutor(parse_workers, mp_context=mp_context, initializer=_init_quiet_worker)
+    max_in_flight = clone_workers + 2 * parse_workers
+    repos = iter(repos)
+    exhausted = False
+    # Work is only submitted to a pool with a free worker, so it starts running when submitted.
+    # pending maps running futures to their job, parse_queue holds checkouts waiting for a parse
+    # worker and abandoned maps futures reported as timed out, which still hold their worker, to
+    # whether they parse.
+    pending = {}
+    parse_queue = collections.deque()
+    abandoned = {}
+    try:
+        while True:
+            parses = sum(job["workdir"] is not None for job in pending.values()) + sum(abandoned.values())
+            while parse_queue and parses < parse_workers:
+                job = parse_queue.popleft()
+                job["started"] = time.perf_counter()
+                pending[parse_pool.submit(_discover, job["workdir"], record_files)] = job
+                parses += 1
+            clones = len(pending) + len(abandoned) - parses
+            free = min(clone_workers - clones, max_in_flight - len(pending) - len(parse_queue) - len(abandoned))
+            if not exhausted and free > 0:
+                taken = 0
+                for customer, url in itertools.islice(repos, free):
+                    now = time.perf_counter()
+                    job = {"customer": customer, "url": url, "admitted": now, "started": now, "seconds": 0.0,
+                           "workdir": None}
+                    pending[clone_pool.submit(_clone, customer, url, fast)] = job
+                    taken += 1
+                exhausted = taken < free
+            if not pending and not parse_queue and exhausted:
+                break
+            wait_seconds = None
+            if timeout is not None and pending:
+                deadline = min(job["started"] + timeout - job["seconds"] for job in pending.values())
+                wait_seconds = max(deadline - time.perf_counter(), 0)
+            done, _ = wait([*pending, *abandoned], timeout=wait_seconds, return_when=FIRST_COMPLETED)
+            for future in done:
+                if abandoned.pop(future, None) is not None:
+                    continue
+                job = pending.pop(future)
+                try:
+                    outcome = future.result()
+                except Exception as ex:
+                    if job["workdir"]:
+                        shutil.rmtree(job["workdir"], ignore_errors=True)
+                    yield _result(job, error=f"{type(ex).__name__}: {ex}")
+                    continue
+                if job["workdir"] is None:
+                    # Clone finished, queue the checkout for a parse worker
+                    job["workdir"] = outcome
+                    job["seconds"] += time.perf_counter() - job["started"]
+                    parse_queue.append(job)
+                else:
+                    shutil.rmtree(job["workdir"], ignore_errors=True)
+                    yield _result(job, **outcome)
+            if timeout is not None:
+                now = time.perf_counter()
+                for future, job in list(pending.items()):
+                    if job["seconds"] + now - job["started"] >= timeout:
+                        del pending[future]
+                        if job["workdir"]:
+                            future.add_done_callback(lambda _, workdir=job["workdir"]: shutil.rmtree(workdir, True))
+                        else:
+                            future.add_done_callback(_remove_workdir)
+                        if not future.cancel():
+                            abandoned[future] = job["workdir"] is not None
+                        yield _result(job, error=f"TimeoutError: no result after {timeout}s")
+    finally:
+        # Don't block on work abandoned by a timeout or an early exit of the caller
+        clone_pool.shutdown(wait=False, cancel_futures=True)
+        parse_pool.shutdown(wait=False, cancel_futures=True)
+        for job in parse_queue:
+            shutil.rmtree(job["workdir"], ignore_errors=True)
+
+
+def _result(job, services_discovered=None, commit=None, file_fragments=None, error=None):
+    result = {
+        "customer": job["customer"],
+        "url": job["url"],
+        "commit": commit,
+        "services_discovered": services_discovered,
+        "error": error,
+        "elapsed": round(time.perf_counter() - job["admitted"], 3),
+    }
+    if file_fragments is not None:
+        result["file_fragments"] = file_fragments
+    return result
+
+
+def parse_repo_arg(value):
+    customer, sep, url = value.partition("=")
+    if not sep or not customer or not url:
+        raise argparse.ArgumentTypeError(f"expected CUSTOMER=URL, got {value!r}")
+    return customer, url
+
+
+def customer_for_url(url):
+    name = url.rstrip("/").rsplit("/", 1)[-1]
+    return name.removesuffix(".git") or "repo"
+
+
+def read_manifest(lines):
+    """Yield (customer, url) for each JSON object line of a manifest, skipping blank lines."""
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+            url = entry.get("url") or entry["repo"]
+        except (ValueError, AttributeError, KeyError) as ex:
+            raise ValueError(f"manifest line {line_number}: expected a JSON object with a url") from ex
+        customer = entry.get("customer") or entry.get("id") or entry.get("request_id") or customer_for_url(url)
+        yield str(customer), url
+
+
+def load_checkpoint(path):
+    """URLs a previous run of the checkpoint already discovered; failed repos are tried again."""
+    completed = set()
+    if path is None or not os.path.exists(path):
+        return completed
+    with open(path, "r", encoding="utf-8") as checkpoint:
+        for line in checkpoint:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A run killed mid-write leaves a truncated last line
+                continue
+            if record.get("error") is None:
+                completed.add(record["url"])
+    return completed
+
+
+def main(argv=None, output=None):
+    parser = argparse.ArgumentParser(description="Discover services in many repositories in parallel.")
+    parser.add_argument("repos", nargs="*", type=parse_repo_arg, metavar="CUSTOMER=URL")
+    parser.add_argument("--manifest", help="JSONL file of repositories to discover, - for stdin")
+    parser.add_argument("--workers", type=int, help="default for both --clone-workers and --parse-workers")
+    parser.add_argument("--clone-workers", type=int)
+    parser.add_argument("--parse-workers", type=int)
+    parser.add_argument("--timeout", type=float, help="seconds after which a repository is reported as failed")
+    parser.add_argument("--checkpoint", help="JSONL file results are appended to; repositories already "
+                                             "discovered in it are skipped")
+    parser.add_argument("--parquet", metavar="DIR", help="also append results to this Parquet dataset")
+    parser.add_argument("--full-clone", action="store_true", help="clone full history instead of a sparse shallow clone")
+    args = parser.parse_args(argv)
+    if not args.repos and not args.manifest:
+        parser.error("give CUSTOMER=URL arguments or a --manifest")
+
+    clone_workers = args.clone_workers or args.workers or DEFAULT_CLONE_WORKERS
+    parse_workers = args.parse_workers or args.workers or DEFAULT_PARSE_WORKERS
+    completed = load_checkpoint(args.checkpoint)
+
+    with contextlib.ExitStack() as stack:
+        repos = iter(args.repos)
+        if args.manifest:
+            manifest = sys.stdin if args.manifest == "-" else stack.enter_context(open(args.manifest, "r", encoding="utf-8"))
+            repos = itertools.chain(repos, read_manifest(manifest))
+        repos = ((customer, url) for customer, url in repos if url not in completed)
+        checkpoint = stack.enter_context(open(args.checkpoint, "a", encoding="utf-8")) if args.checkpoint else None
+        parquet = None
+        if args.parquet:
+            import columnar_export
+            parquet = stack.enter_context(columnar_export.ParquetDatasetWriter(args.parquet))
+        # Records go to output (stdout by default); progress printed meanwhile goes to stderr
+        if output is None:
+            output = sys.stdout
+        stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+
+        failed = 0
+        for result in discover_batch(repos, clone_workers, parse_workers, fast=not args.full_clone, timeout=args.timeout,
+                                     record_files=parquet is not None):
+            failed += result["error"] is not None
+            if parquet is not None and result["error"] is None:
+                parquet.append(result)
+            result.pop("file_fragments", None)
+            record = json.dumps(result)
+            print(record, file=output, flush=True)
+            if checkpoint is not None:
+                print(record, file=checkpoint, flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    # Clones abandoned by a timeout may still report after main returns, so the process keeps
+    # stdout for the records until it exits
+    output, sys.stdout = sys.stdout, sys.stderr
+    sys.exit(main(output=output))
@@ -0,0 +1,82 @@
+"""Benchmark full vs. fast (shallow, blobless, sparse) clones.
+
+Builds a synthetic repository with history and large non-manifest blobs,
+serves it from a local bare repo over file://, and reports the object bytes
+received and the time to the first discovery result for each clone mode.
+
+    python benchmarks/bench_clone.py --commits 20 --blobs 200
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discovery  # noqa: E402
+
+
+def git(*args, cwd=None):
+    subprocess.run(["git", *args], cwd=cwd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def build_bare_repo(root, commits, blobs, blob_size):
+    work = os.path.join(root, "work")
+    os.makedirs(os.path.join(work, "src"))
+    os.makedirs(os.path.join(work, "data"))
+    git("init", "-q", "-b", "main", work)
+    git("config", "user.email", "bench@example.com", cwd=work)
+    git("config", "user.name", "bench", cwd=work)
+    with open(os.path.join(work, "requirements.txt"), "w") as f:
+        f.write("redis\npymongo\n")
+    with open(os.path.join(work, "src", "app.py"), "w") as f:
+        f.write("import boto3\nsqs = boto3.client('sqs')\n")
+    for commit in range(commits):
+        for blob in range(blobs):
+            with open(os.path.join(work, "data", f"blob_{blob}.bin"), "wb") as f:
+                f.write(os.urandom(blob_size))
+        git("add", "-A", cwd=work)
+        git("commit", "-q", "-m", f"commit {commit}", cwd=work)
+    bare = os.path.join(root, "origin.git")
+    git("clone", "-q", "--bare", work, bare)
+    git("config", "uploadpack.allowFilter", "true", cwd=bare)
+    git("config", "uploadpack.allowAnySHA1InWant", "true", cwd=bare)
+    return bare
+
+
+def object_bytes(directory):
+    total = 0
+    for root, _, filenames in os.walk(os.path.join(directory, ".git", "objects")):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(root, filename))
+    return total
+
+
+def run(url, directory, fast):
+    start = time.perf_counter()
+    discovery.clone_repo(url, directory, fast=fast)
+    discovered = discovery.Githubdisovery().discover_services_in_repo(directory)
+    elapsed = time.perf_counter() - start
+    return elapsed, object_bytes(directory), discovered
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commits", type=int, default=20)
+    parser.add_argument("--blobs", type=int, default=200)
+    parser.add_argument("--blob-size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bare = build_bare_repo(tmp, args.commits, args.blobs, args.blob_size)
+        url = f"file://{bare}"
+        results = {}
+        for mode, fast in (("full", False), ("fast", True)):
+            results[mode] = run(url, os.path.join(tmp, mode), fast)
+            elapsed, size, _ = results[mode]
+            print(f"{mode:>5}: {elapsed:8.3f}s to first result, {size / 1024:12.1f} KiB objects received")
+        assert results["full"][2] == results["fast"][2], "fast clone changed the discovery result"
+        print(f"speedup {results['full'][0] / results['fast'][0]:.1f}x, "
+              f"{results['full'][1] / max(results['fast'][1], 1):.1f}x fewer bytes")
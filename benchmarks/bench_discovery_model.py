@@ -0,0 +1,79 @@
+"""Benchmark keeping many discovery results as Discovery models instead of dicts.
+
+Builds --repos synthetic services_discovered dicts (with the duplicate list
+entries parsers append), then reports the memory both forms hold, and the time
+to find the distinct architectures and to merge every result into one.
+
+    python benchmarks/bench_discovery_model.py --repos 10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discovery  # noqa: E402
+import discovery_model  # noqa: E402
+
+Services = discovery.Services
+
+
+def synthetic_results(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        result = {Services.DATABASE: rng.choices(["mysql", "mongodb", "postgres"], k=rng.randint(0, 6)),
+                  Services.CACHE: rng.choices(["redis"], k=rng.randint(0, 3)),
+                  Services.APP_SERVER: rng.choice(["NodeJs", "Flask"])}
+        for key in discovery_model.AWS_SERVICE_KEYS:
+            if rng.random() < 0.3:
+                result[key] = "enabled"
+        if rng.random() < 0.5:
+            result[Services.LOAD_BALANCER] = {"servers_count": 2, "servers": ["10.0.0.1", "10.0.0.2"]}
+        yield result
+
+
+def measured(build):
+    # Timed without tracemalloc, which slows every allocation down
+    start = time.perf_counter()
+    build()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size, seconds
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repos", type=int, default=10000)
+    args = parser.parse_args()
+
+    dicts, dict_bytes, _ = measured(lambda: list(synthetic_results(args.repos)))
+    models, model_bytes, convert = measured(lambda: [discovery_model.Discovery.from_dict(result) for result in dicts])
+    print(f"{args.repos} results: dicts {dict_bytes / 1024:.0f} KiB, models {model_bytes / 1024:.0f} KiB "
+          f"(converted in {convert * 1000:.0f}ms)")
+
+    start = time.perf_counter()
+    distinct_dicts = {json.dumps(result, sort_keys=True) for result in dicts}
+    dict_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    distinct_models = set(models)
+    model_seconds = time.perf_counter() - start
+    print(f"distinct architectures: dicts {len(distinct_dicts)} in {dict_seconds * 1000:.1f}ms, "
+          f"models {len(distinct_models)} in {model_seconds * 1000:.1f}ms")
+
+    start = time.perf_counter()
+    merged = discovery.Githubdisovery()
+    for result in dicts:
+        merged.merge_fragment(result)
+    dict_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    merged_model = discovery_model.Discovery.merge_all(models)
+    model_seconds = time.perf_counter() - start
+    assert merged_model == discovery_model.Discovery.from_dict(merged.services_discovered)
+    print(f"merge all: dicts {dict_seconds * 1000:.1f}ms, models {model_seconds * 1000:.1f}ms")
@@ -0,0 +1,61 @@
+"""Benchmark the layout-free renderer against the diagrams object graph.
+
+Times building one diagram's DOT source with diagrams (aws_dac_generator.diagram_source)
+and with dot_renderer.architecture_dot, and writing a complete SVG with the precomputed
+layout. With Graphviz on PATH it also times the full graphviz PNG render.
+
+    python benchmarks/bench_dot_renderer.py --repeat 200
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aws_dac_generator  # noqa: E402
+import dot_renderer  # noqa: E402
+
+DISCOVERY = {
+    "static_content": "enabled",
+    "lb": {"servers": ["10.1.0.101", "10.1.0.102", "10.1.0.103"]},
+    "app_server": "NodeJs",
+    "database": ["mysql", "mongodb"],
+    "cache": ["redis"],
+    "aws_sqs": "enabled",
+    "aws_sns": "enabled",
+    "aws_s3": "enabled",
+}
+
+
+def timed(function, repeat):
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    baseline = timed(lambda: aws_dac_generator.diagram_source("Customer", DISCOVERY), args.repeat)
+    print(f"diagrams object graph -> DOT: {baseline * 1000:.3f}ms")
+    for name, function in (("dot_renderer -> DOT", dot_renderer.architecture_dot),
+                           ("dot_renderer -> SVG, precomputed layout", dot_renderer.architecture_svg)):
+        seconds = timed(lambda: function("Customer", DISCOVERY), args.repeat)
+        print(f"{name}: {seconds * 1000:.3f}ms ({baseline / seconds:.1f}x)")
+
+    if shutil.which("dot"):
+        with tempfile.TemporaryDirectory() as output_dir:
+            filename = os.path.join(output_dir, "customer")
+            png = timed(lambda: aws_dac_generator.render_diagram("Customer", DISCOVERY, filename, "png"), 10)
+            svg = timed(lambda: aws_dac_generator.render_diagram("Customer", DISCOVERY, filename, "svg",
+                                                                 layout="precomputed"), 10)
+        print(f"graphviz PNG render: {png * 1000:.1f}ms, precomputed SVG render: {svg * 1000:.1f}ms ({png / svg:.0f}x)")
+    else:
+        print("Graphviz not on PATH, skipping the full render comparison")
@@ -0,0 +1,78 @@
+"""Throughput and peak memory of iac_analyzer on multi-megabyte templates.
+
+Generates a CloudFormation template of --resources resources as YAML and as
+CDK-style JSON, and a Terraform file of as many resources, then times each
+analyzer and records its peak allocation with tracemalloc in a second run. The YAML template
+is also loaded whole with yaml.load as the reference the event walk avoids.
+
+    python benchmarks/bench_iac.py --resources 20000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import iac_analyzer  # noqa: E402
+
+TYPES = ["AWS::SQS::Queue", "AWS::SNS::Topic", "AWS::S3::Bucket", "AWS::Lambda::Function", "AWS::IAM::Role",
+         "AWS::DynamoDB::Table"]
+
+
+def template(resources):
+    body = {}
+    for index in range(resources):
+        properties = {"Tags": [{"Key": "team", "Value": f"team{index % 7}"}, {"Key": "env", "Value": "prod"}],
+                      "Description": "generated " * 8}
+        if index:
+            properties["Target"] = {"Fn::GetAtt": [f"Resource{index - 1}", "Arn"]}
+            properties["Name"] = {"Fn::Sub": f"${{AWS::StackName}}-${{Resource{index - 1}}}"}
+        body[f"Resource{index}"] = {"Type": TYPES[index % len(TYPES)], "Properties": properties}
+    return {"AWSTemplateFormatVersion": "2010-09-09", "Resources": body}
+
+
+def terraform(resources):
+    lines = []
+    for index in range(resources):
+        lines.append(f'resource "aws_sqs_queue" "queue{index}" {{\n  name = "queue-{index}-${{var.env}}"\n'
+                     f'  tags = {{ team = "team{index % 7}" }}\n')
+        if index:
+            lines.append(f"  redrive_policy = jsonencode({{ deadLetterTargetArn = aws_sqs_queue.queue{index - 1}.arn }})\n")
+        lines.append("}\n\n")
+    return "".join(lines).encode()
+
+
+def measure(label, function, content):
+    # Timed untraced; tracemalloc slows allocation-heavy code down several times
+    start = time.perf_counter()
+    result = function(content)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    function(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label}: {len(content) / 1024 ** 2:.1f} MiB in {seconds:.2f}s ({len(content) / 1024 ** 2 / seconds:.1f} MiB/s), "
+          f"peak {peak / 1024 ** 2:.1f} MiB, {len(result)} entries")
+
+
+def yaml_load(content):
+    import yaml
+    return yaml.load(content, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))["Resources"]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resources", type=int, default=20000)
+    args = parser.parse_args()
+
+    import yaml
+    document = template(args.resources)
+    yaml_content = yaml.dump(document, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper)).encode()
+    json_content = json.dumps(document, indent=1).encode()
+    measure("cloudformation yaml", iac_analyzer.analyze_yaml_manifest, yaml_content)
+    measure("yaml.load reference", yaml_load, yaml_content)
+    measure("cdk json", iac_analyzer.analyze_json_manifest, json_content)
+    measure("terraform", lambda content: iac_analyzer.analyze_terraform(content.decode()), terraform(args.resources))
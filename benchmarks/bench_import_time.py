@@ -0,0 +1,53 @@
+"""Import-time budget for the headless discovery core.
+
+Measures `python -X importtime -c "import <module>"` (best of several runs)
+and fails when the cumulative import time exceeds the budget, or when the
+module drags in the UI or diagram stacks.
+
+    python benchmarks/bench_import_time.py --budget-ms 120
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the discovery core must not import
+HEAVY_MODULES = ["streamlit", "diagrams", "graphviz", "git", "pandas", "pyarrow"]
+
+
+def cumulative_import_us(module):
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=ROOT, capture_output=True, text=True, check=True)
+    for line in completed.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nesting shown by indentation
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].rstrip() == f" {module}":
+            return int(fields[1])
+    raise RuntimeError(f"no importtime entry for {module}")
+
+
+def heavy_modules_loaded(module):
+    probe = f"import sys, {module}; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    completed = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    return completed.stdout.split()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", action="append", help="module to measure (default: discovery)")
+    parser.add_argument("--budget-ms", type=float, default=120.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.module or ["discovery"]:
+        best_ms = min(cumulative_import_us(module) for _ in range(args.runs)) / 1000
+        heavy = heavy_modules_loaded(module)
+        status = "ok"
+        if best_ms > args.budget_ms or heavy:
+            status = "FAIL"
+            failed = True
+        print(f"{module}: {best_ms:.1f}ms (budget {args.budget_ms:.0f}ms), heavy imports: {heavy or 'none'} [{status}]")
+    sys.exit(1 if failed else 0)
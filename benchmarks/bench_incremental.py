@@ -0,0 +1,96 @@
+"""Benchmark incremental re-discovery against a full rescan.
+
+Builds a synthetic repository (50k files by default) with git fast-import,
+adds a second commit that modifies, deletes and adds a handful of files,
+then times a full snapshot of the new commit against rediscover() from the
+snapshot of the previous one.
+
+    python benchmarks/bench_incremental.py --files 50000 --changes 20
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import incremental_discovery  # noqa: E402
+
+AWS_SERVICES = ["s3", "sqs", "sns", "rds", "lambda", "cloudtrail"]
+
+
+def py_source(rng):
+    service = rng.choice(AWS_SERVICES)
+    if rng.random() < 0.05:
+        return f"import boto3\nclient = boto3.client('{service}')\n"
+    return f"def handler_{rng.randrange(10 ** 6)}(event):\n    return event\n"
+
+
+def file_content(path, rng):
+    if path.endswith(".py"):
+        return py_source(rng)
+    if path.endswith("requirements.txt"):
+        return rng.choice(["redis\n", "pymongo\n", "mysqlclient==1.3.12\n", "Flask\n"])
+    return "x" * rng.randrange(64, 512) + "\n"
+
+
+def commit_stream(ref, mark, parent_mark, files, deleted=()):
+    out = []
+    for path, content in files.items():
+        data = content.encode("utf-8")
+        out.append(f"M 100644 inline {path}\ndata {len(data)}\n".encode("utf-8") + data + b"\n")
+    for path in deleted:
+        out.append(f"D {path}\n".encode("utf-8"))
+    header = f"commit {ref}\nmark :{mark}\ncommitter bench <bench@example.com> 0 +0000\ndata 6\nbench\n"
+    if parent_mark:
+        header += f"from :{parent_mark}\n"
+    return header.encode("utf-8") + b"".join(out) + b"\n"
+
+
+def build_repo(directory, file_count, change_count, seed=0):
+    rng = random.Random(seed)
+    subprocess.run(["git", "init", "-q", "--bare", directory], check=True)
+    files = {}
+    for index in range(file_count):
+        package = f"pkg{index % 500}/mod{index // 500 % 20}"
+        suffix = rng.choice([".py", ".py", ".py", ".txt", ".md"])
+        name = "requirements.txt" if index % 1000 == 0 else f"file{index}{suffix}"
+        path = f"{package}/{name}"
+        files[path] = file_content(path, rng)
+    paths = sorted(files)
+    modified = {path: file_content(path, rng) + "# changed\n" for path in rng.sample(paths, change_count)}
+    deleted = [path for path in rng.sample(paths, change_count) if path not in modified]
+    added = {f"new/file{index}.py": py_source(rng) for index in range(change_count)}
+    stream = commit_stream("refs/heads/main", 1, None, files)
+    stream += commit_stream("refs/heads/main", 2, 1, {**modified, **added}, deleted)
+    subprocess.run(["git", "fast-import", "--quiet"], input=stream, cwd=directory, check=True)
+    subprocess.run(["git", "symbolic-ref", "HEAD", "refs/heads/main"], cwd=directory, check=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--changes", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = os.path.join(tmp, "synthetic.git")
+        build_repo(repo, args.files, args.changes)
+        previous = incremental_discovery.snapshot_discovery(repo, "HEAD~1")
+
+        start = time.perf_counter()
+        full = incremental_discovery.snapshot_discovery(repo, "HEAD")
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        incremental = incremental_discovery.rediscover(repo, previous, "HEAD")
+        incremental_time = time.perf_counter() - start
+
+        assert incremental.file_fragments == full.file_fragments, "incremental result differs from full rescan"
+        assert incremental.services_discovered == full.services_discovered
+        print(f"{args.files} files, {args.changes} changes per kind")
+        print(f"       full rescan: {full_time:8.3f}s")
+        print(f"incremental update: {incremental_time:8.3f}s ({full_time / incremental_time:.1f}x faster)")
@@ -0,0 +1,77 @@
+"""Throughput of the JavaScript/TypeScript import scanner on a large repo.
+
+Generates --files sources in memory (ES modules, CommonJS and a share of
+minified bundles), runs each through discovery as the repo walk would, and
+reports files and MiB per second. With --checkout DIR the sources are also
+written there and discovered through the full directory walk.
+
+    python benchmarks/bench_js_scan.py --files 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discovery  # noqa: E402
+
+IMPORTS = ["import express from 'express';", "import { useState } from \"react\";",
+           "const path = require('path');", "import * as utils from '../utils';",
+           "import type { Config } from './config';", "const lodash = require(\"lodash\");"]
+SERVICE_IMPORTS = ["import { SQSClient } from '@aws-sdk/client-sqs';", "const Redis = require('ioredis');",
+                   "import { Kafka } from 'kafkajs';", "const { Pool } = require('pg');"]
+BODY = ("export function handler{index}(event, context) {{\n"
+        "  const items = event.records.map((record) => ({{ id: record.id, value: record.value * {index} }}));\n"
+        "  return new Promise((resolve) => setTimeout(() => resolve(items), 10));\n"
+        "}}\n")
+
+
+def synthetic_sources(count, functions, seed=0):
+    rng = random.Random(seed)
+    for index in range(count):
+        extension = rng.choice([".js", ".ts", ".mjs", ".cjs"])
+        if rng.random() < 0.02:
+            yield f"bundle{index}.min.js", ("var a=require('ioredis');function b(c){return c*2}" * 400).encode()
+            continue
+        lines = rng.sample(IMPORTS, 3)
+        if rng.random() < 0.01:
+            lines.append(rng.choice(SERVICE_IMPORTS))
+        lines.extend(BODY.format(index=function) for function in range(functions))
+        yield f"module{index}{extension}", "\n".join(lines).encode()
+
+
+def write_checkout(directory, sources):
+    for index, (filename, content) in enumerate(sources):
+        package = os.path.join(directory, f"pkg{index % 500}")
+        os.makedirs(package, exist_ok=True)
+        with open(os.path.join(package, filename), "wb") as file:
+            file.write(content)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--functions", type=int, default=12, help="functions per source, about 250 bytes each")
+    parser.add_argument("--checkout", help="also write the sources here and walk them")
+    args = parser.parse_args()
+
+    sources = list(synthetic_sources(args.files, args.functions))
+    total_bytes = sum(len(content) for _, content in sources)
+    finder = discovery.Githubdisovery()
+    start = time.perf_counter()
+    for filename, content in sources:
+        finder.discover_file(filename, lambda binary, max_bytes: content)
+    seconds = time.perf_counter() - start
+    print(f"scan: {args.files} files, {total_bytes / 1024 ** 2:.0f} MiB in {seconds:.2f}s "
+          f"({args.files / seconds:,.0f} files/s, {total_bytes / 1024 ** 2 / seconds:.0f} MiB/s)")
+    print("found", {service: sorted(set(value)) if isinstance(value, list) else value
+                    for service, value in finder.services_discovered.items()})
+
+    if args.checkout:
+        write_checkout(args.checkout, sources)
+        start = time.perf_counter()
+        discovery.Githubdisovery().discover_services_in_repo(args.checkout)
+        seconds = time.perf_counter() - start
+        print(f"walk: {args.files} files in {seconds:.2f}s ({args.files / seconds:,.0f} files/s)")
@@ -0,0 +1,70 @@
+"""Benchmark of the dependency parsers on large generated lockfiles.
+
+Generates a package-lock.json (v3), a yarn.lock and a poetry.lock of about
+--megabytes each, with a few service client packages among thousands of
+others, and times discovery on each.
+
+    python benchmarks/bench_lockfiles.py --megabytes 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discovery  # noqa: E402
+
+NPM_SERVICE_PACKAGES = ["pg", "ioredis", "kafkajs", "@elastic/elasticsearch"]
+PYTHON_SERVICE_PACKAGES = ["psycopg2-binary", "redis", "confluent-kafka", "elasticsearch"]
+
+
+def package_names(megabytes, entry_bytes, service_packages, seed=0):
+    rng = random.Random(seed)
+    count = megabytes * 1024 * 1024 // entry_bytes
+    names = [f"pkg-{rng.getrandbits(40):x}" for _ in range(count)]
+    for index, name in enumerate(service_packages):
+        names[index * count // len(service_packages)] = name
+    return names
+
+
+def package_lock(names):
+    packages = {"": {"name": "app"}}
+    for name in names:
+        packages[f"node_modules/{name}"] = {
+            "version": "1.0.0", "resolved": f"https://registry.npmjs.org/{name}/-/{name}-1.0.0.tgz",
+            "integrity": "sha512-" + "A" * 86 + "==", "dependencies": {"left-pad": "^1.3.0"}}
+    return json.dumps({"name": "app", "lockfileVersion": 3, "packages": packages}, indent=2)
+
+
+def yarn_lock(names):
+    return "# yarn lockfile v1\n\n" + "".join(
+        f'"{name}@^1.0.0":\n  version "1.0.0"\n  resolved "https://registry.yarnpkg.com/{name}/-/{name}-1.0.0.tgz"\n'
+        f'  integrity sha512-{"A" * 86}==\n  dependencies:\n    left-pad "^1.3.0"\n\n' for name in names)
+
+
+def poetry_lock(names):
+    return "".join(
+        f'[[package]]\nname = "{name}"\nversion = "1.0.0"\n'
+        f'description = ""\noptional = false\npython-versions = ">=3.8"\nfiles = [\n'
+        f'    {{file = "{name}-1.0.0.tar.gz", hash = "sha256:{"0" * 64}"}},\n]\n\n' for name in names)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=20)
+    args = parser.parse_args()
+
+    for filename, generate, entry_bytes, service_packages in (
+            ("package-lock.json", package_lock, 330, NPM_SERVICE_PACKAGES),
+            ("yarn.lock", yarn_lock, 230, NPM_SERVICE_PACKAGES),
+            ("poetry.lock", poetry_lock, 250, PYTHON_SERVICE_PACKAGES)):
+        content = generate(package_names(args.megabytes, entry_bytes, service_packages))
+        finder = discovery.Githubdisovery()
+        start = time.perf_counter()
+        finder.discover_file(filename, lambda binary, max_bytes: content)
+        seconds = time.perf_counter() - start
+        print(f"{filename}: {len(content) / 1024 ** 2:.1f} MiB in {seconds * 1000:.0f}ms "
+              f"({len(content) / 1024 ** 2 / seconds:.0f} MiB/s), found {finder.services_discovered}")
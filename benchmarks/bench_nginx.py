@@ -0,0 +1,52 @@
+"""Benchmark of nginx_analyzer on a large generated config with many includes.
+
+Writes a main config including --includes upstream files, a share of them
+identical as generated configs tend to be, then times load_config with a
+cold analysis cache and again with a warm one.
+
+    python benchmarks/bench_nginx.py --includes 500 --servers 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nginx_analyzer  # noqa: E402
+
+
+def write_config(directory, includes, servers, distinct):
+    os.makedirs(os.path.join(directory, "conf.d"))
+    with open(os.path.join(directory, "nginx.conf"), "w") as file:
+        file.write("events { worker_connections 1024; }\nhttp {\n    include conf.d/*.conf;\n"
+                   "    server { listen 80; location / { proxy_pass http://pool0; } }\n}\n")
+    for index in range(includes):
+        pool = index % distinct
+        with open(os.path.join(directory, "conf.d", f"{index:05}.conf"), "w") as file:
+            file.write(f"# generated\nupstream pool{pool} {{\n    least_conn;\n")
+            for server in range(servers):
+                file.write(f"    server 10.{pool // 256}.{pool % 256}.{server}:8080 weight={server % 5 + 1} "
+                           f"max_fails=3 fail_timeout=30s;\n")
+            file.write("}\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--includes", type=int, default=500)
+    parser.add_argument("--servers", type=int, default=20)
+    parser.add_argument("--distinct", type=int, default=50, help="distinct include files among them")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_config(directory, args.includes, args.servers, args.distinct)
+        for label in ("cold", "warm"):
+            if label == "cold":
+                nginx_analyzer._analyses.clear()
+            start = time.perf_counter()
+            analysis = nginx_analyzer.load_config(os.path.join(directory, "nginx.conf"))
+            seconds = time.perf_counter() - start
+            servers = sum(len(servers) for servers in analysis["upstreams"].values())
+            print(f"{label}: {args.includes} includes, {len(analysis['upstreams'])} upstreams, {servers} servers "
+                  f"in {seconds * 1000:.1f}ms ({len(nginx_analyzer._analyses)} analyses cached)")
@@ -0,0 +1,54 @@
+"""Benchmark intra-repo parallel parsing against the serial walk.
+
+Writes a synthetic checkout of Python sources and reports the time of
+discover_services_in_repo serially and with 1, 2, 4, ... worker processes
+up to the machine's core count.
+
+    python benchmarks/bench_parallel_parse.py --files 20000 --lines 400
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discovery  # noqa: E402
+
+
+def build_checkout(directory, file_count, lines, seed=0):
+    rng = random.Random(seed)
+    body = "".join(f"value_{index} = compute({index}, 'payload')\n" for index in range(lines))
+    for index in range(file_count):
+        package = os.path.join(directory, f"pkg{index % 200}")
+        os.makedirs(package, exist_ok=True)
+        header = "import boto3\nclient = boto3.client('sqs')\n" if rng.random() < 0.01 else ""
+        with open(os.path.join(package, f"module{index}.py"), "w") as f:
+            f.write(header + body)
+
+
+def timed(directory, workers):
+    start = time.perf_counter()
+    discovered = discovery.Githubdisovery().discover_services_in_repo(directory, workers=workers)
+    return time.perf_counter() - start, discovered
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--lines", type=int, default=400)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_checkout(tmp, args.files, args.lines)
+        serial_time, serial = timed(tmp, None)
+        print(f"{args.files} files on {os.cpu_count()} cores")
+        print(f"   serial: {serial_time:8.3f}s")
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            elapsed, discovered = timed(tmp, workers)
+            assert discovered == serial, "parallel result differs from the serial walk"
+            print(f"{workers:2d} worker: {elapsed:8.3f}s ({serial_time / elapsed:.2f}x)")
+            workers *= 2
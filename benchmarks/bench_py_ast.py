@@ -0,0 +1,79 @@
+"""Compare the AST analyzer with the boto3 call pattern for speed and precision.
+
+Runs both Python discovery modes over test_repos/customerB/src plus a few
+tricky cases (aliases, from-imports, constants, commented-out calls) and
+reports per-file time, precision and recall against hand-labelled truth.
+
+    python benchmarks/bench_py_ast.py --repeat 200
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import discovery  # noqa: E402
+from discovery import Services  # noqa: E402
+
+SOURCE_DIR = os.path.join(ROOT, "test_repos", "customerB", "src")
+
+# Expected services per file of SOURCE_DIR
+EXPECTED = {
+    "test1.py": {Services.AWS_S3},
+    "test2.py": {Services.AWS_SQS},
+    "test3.py": {Services.AWS_SNS},
+    "test4.py": {Services.AWS_RDS},
+}
+
+TRICKY = {
+    "from_import.py": ("from boto3 import client\nsqs = client('sqs')\n", {Services.AWS_SQS}),
+    "alias.py": ("import boto3 as aws\nbucket = aws.resource('s3')\n", {Services.AWS_S3}),
+    "constant.py": ("import boto3\nSERVICE = 'sn' + 's'\nboto3.client(SERVICE)\n", {Services.AWS_SNS}),
+    "session.py": ("import boto3\nsession = boto3.Session()\nsession.client('lambda')\n", {Services.AWS_LAMBDA}),
+    "commented.py": ("import boto3\n# boto3.client('rds')\n", set()),
+    "docstring.py": ('"""Call boto3.client("cloudtrail") to audit."""\n', set()),
+    "redis.py": ("import redis\ncache = redis.Redis()\n", {Services.CACHE}),
+}
+
+
+def discovered_keys(source, python_ast):
+    discoverer = discovery.Githubdisovery(python_ast=python_ast)
+    discoverer.parse_from_py_files_ast(source) if python_ast else discoverer.parse_from_py_files(source)
+    return set(discoverer.services_discovered)
+
+
+def score(cases, python_ast):
+    true_positive = false_positive = false_negative = 0
+    for source, expected in cases.values():
+        found = discovered_keys(source, python_ast)
+        true_positive += len(found & expected)
+        false_positive += len(found - expected)
+        false_negative += len(expected - found)
+    precision = true_positive / max(true_positive + false_positive, 1)
+    recall = true_positive / max(true_positive + false_negative, 1)
+    return precision, recall
+
+
+def timed(cases, python_ast, repeat):
+    sources = [source for source, _ in cases.values()]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for source in sources:
+            discovered_keys(source, python_ast)
+    return (time.perf_counter() - start) / (repeat * len(sources))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    customer_b = {name: (discovery.read_file(os.path.join(SOURCE_DIR, name)), expected) for name, expected in EXPECTED.items()}
+    for label, cases in (("customerB/src", customer_b), ("customerB/src + tricky", {**customer_b, **TRICKY})):
+        print(label)
+        for mode, python_ast in (("pattern", False), ("ast", True)):
+            precision, recall = score(cases, python_ast)
+            per_file = timed(cases, python_ast, args.repeat)
+            print(f"  {mode:>7}: {per_file * 1e6:8.1f}us/file  precision {precision:.2f}  recall {recall:.2f}")
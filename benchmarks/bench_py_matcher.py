@@ -0,0 +1,64 @@
+"""Micro-benchmark of the boto3 call matcher used by parse_from_py_files.
+
+Compares the previous per-service substring scans with the single-pass
+boto3_service_names() scan on a large synthetic source, for the shipped service
+table and for tables padded with extra service names.
+
+    python benchmarks/bench_py_matcher.py --megabytes 16
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discovery  # noqa: E402
+
+
+def substring_scan(file_content, services):
+    found = set()
+    for key, val in services.items():
+        if f"boto3.client('{val}')" in file_content or f'boto3.client("{val}")' in file_content:
+            found.add(key)
+    return found
+
+
+def pattern_scan(file_content, services):
+    found = set()
+    for name in discovery.boto3_service_names(file_content):
+        if service := services.get(name):
+            found.add(service)
+    return found
+
+
+def synthetic_source(megabytes, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        if rng.random() < 0.001:
+            line = f"client = boto3.client('{rng.choice(list(discovery.BOTO3_SERVICES))}')\n"
+        else:
+            line = f"result_{rng.randrange(10 ** 6)} = self.handler.process(event, context, retries=3)\n"
+        lines.append(line)
+        size += len(line)
+    return "".join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    source = synthetic_source(args.megabytes)
+    for extra in (0, 50, 200):
+        by_service = {f"aws_extra_{index}": f"extra{index}" for index in range(extra)}
+        by_service.update({service: name for name, service in discovery.BOTO3_SERVICES.items()})
+        by_name = {name: service for service, name in by_service.items()}
+        assert substring_scan(source, by_service) == pattern_scan(source, by_name)
+        old = min(timeit.repeat(lambda: substring_scan(source, by_service), number=1, repeat=args.repeat))
+        new = min(timeit.repeat(lambda: pattern_scan(source, by_name), number=1, repeat=args.repeat))
+        print(f"{len(by_service):4d} services, {args.megabytes} MiB: substring {old:7.3f}s, pattern {new:7.3f}s")
@@ -0,0 +1,61 @@
+"""Benchmark parallel, single-layout diagram rendering against the serial loop.
+
+Renders synthetic discoveries for --customers customers in every --formats
+format: first one dot run per customer and format in a serial loop (what a
+Diagram with a list outformat does), then aws_dac_generator.render_diagrams
+on a process pool with one dot run per customer. Needs Graphviz on PATH.
+
+    python benchmarks/bench_render.py --customers 200 --formats png,svg,dot
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aws_dac_generator  # noqa: E402
+
+
+def synthetic_discoveries(count, seed=0):
+    rng = random.Random(seed)
+    discoveries = {}
+    for index in range(count):
+        discovery = {"lb": {"servers": [f"app{n}" for n in range(rng.randint(1, 4))]},
+                     "database": rng.sample(["mysql", "postgresql", "mongodb"], rng.randint(0, 3))}
+        if rng.random() < 0.5:
+            discovery.update({"cache": ["redis"], "aws_sqs": "enabled", "aws_s3": "enabled"})
+        discoveries[f"Customer{index}"] = discovery
+    return discoveries
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=200)
+    parser.add_argument("--formats", default="png,svg,dot")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    formats = args.formats.split(",")
+    discoveries = synthetic_discoveries(args.customers)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        for customer, discovery in discoveries.items():
+            for one_format in formats:
+                aws_dac_generator.render_diagram(customer, discovery, os.path.join(output_dir, customer), one_format)
+        serial = time.perf_counter() - start
+        print(f"serial, one dot run per format: {serial:.2f}s")
+
+        with ProcessPoolExecutor(args.workers) as executor:
+            # Start the workers before timing, like a long-running service would have them
+            wait([executor.submit(int) for _ in range(args.workers)])
+            start = time.perf_counter()
+            futures = aws_dac_generator.render_diagrams(discoveries, output_dir, formats, executor=executor)
+            wait(futures.values())
+            parallel = time.perf_counter() - start
+        for future in futures.values():
+            future.result()
+        print(f"{args.workers} workers, one dot run per customer: {parallel:.2f}s ({serial / parallel:.1f}x)")
@@ -0,0 +1,187 @@
+"""Columnar export of discovery results for fleet-wide queries.
+
+Flattens discovery results into one row per (repo, service, value, evidence file) and writes
+them as an Arrow table to Parquet, either as a single file or appended to a dataset directory
+partitioned by scan date. Queries then scan a few columns instead of loading JSON per repo:
+
+    python batch_discovery.py --manifest repos.jsonl --parquet scans/
+    python columnar_export.py export results.jsonl scans/
+    python columnar_export.py query scans/ cache=redis aws_sqs
+
+pyarrow is imported on first use, so importing this module stays cheap.
+"""
+import argparse
+import datetime
+import functools
+import json
+import operator
+import sys
+import uuid
+
+DEFAULT_PARTITIONING = ("scan_date",)
+# Results buffered by ParquetDatasetWriter before a file is written
+DEFAULT_ROWS_PER_FILE = 100_000
+
+
+def schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("customer", pa.string()),
+        ("repo_url", pa.string()),
+        ("commit_sha", pa.string()),
+        # services_discovered key, e.g. "cache", "aws_sqs" or "docker.app_server"
+        ("service", pa.string()),
+        # What was found for it, e.g. "redis"; null for services that are only "enabled"
+        ("value", pa.string()),
+        # Repo path of the file the finding came from; null when discovery didn't record files
+        ("evidence_file", pa.string()),
+        ("discovered_at", pa.timestamp("us", tz="UTC")),
+        ("scan_date", pa.string()),
+    ])
+
+
+def flatten(services_discovered, prefix=""):
+    """(service, value) pairs of a services_discovered dict; nested dicts give dotted service names."""
+    for key, value in services_discovered.items():
+        service = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, f"{service}.")
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            # infrastructure.<address> lists the address's declarations; their type is the value
+            items = (item.get("type") if isinstance(item, dict) else item for item in value)
+            for item in dict.fromkeys(items):
+                yield service, str(item)
+        elif value == "enabled":
+            yield service, None
+        elif value is not None:
+            yield service, str(value)
+
+
+def result_rows(result, discovered_at=None):
+    """Rows for one batch_discovery result (customer, url, commit, services_discovered, file_fragments)."""
+    if discovered_at is None:
+        discovered_at = datetime.datetime.now(datetime.timezone.utc)
+    common = {
+        "customer": result.get("customer"),
+        "repo_url": result.get("url"),
+        "commit_sha": result.get("commit"),
+        "discovered_at": discovered_at,
+        "scan_date": discovered_at.date().isoformat(),
+    }
+    if result.get("file_fragments") is not None:
+        sources = sorted(result["file_fragments"].items())
+    else:
+        sources = [(None, result.get("services_discovered") or {})]
+    seen = set()
+    for evidence_file, fragment in sources:
+        for service, value in flatten(fragment):
+            if (service, value, evidence_file) not in seen:
+                seen.add((service, value, evidence_file))
+                yield {**common, "service": service, "value": value, "evidence_file": evidence_file}
+
+
+def to_table(rows):
+    import pyarrow as pa
+    return pa.Table.from_pylist(list(rows), schema=schema())
+
+
+def write_parquet(results, path):
+    """Write the rows of all results to a single Parquet file."""
+    import pyarrow.parquet as pq
+    pq.write_table(to_table(row for result in results for row in result_rows(result)), path)
+
+
+class ParquetDatasetWriter:
+    """Appends results to a Parquet dataset directory, hive-partitioned by partition_by columns.
+
+    Every flush writes new files next to the existing ones, so runs append to the same dataset.
+    """
+
+    def __init__(self, root, partition_by=DEFAULT_PARTITIONING, rows_per_file=DEFAULT_ROWS_PER_FILE):
+        self.root = root
+        self.partition_by = list(partition_by)
+        self.rows_per_file = rows_per_file
+        self.rows = []
+        self.rows_written = 0
+
+    def append(self, result, discovered_at=None):
+        self.rows.extend(result_rows(result, discovered_at))
+        if len(self.rows) >= self.rows_per_file:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        import pyarrow.dataset as ds
+        ds.write_dataset(
+            to_table(self.rows), self.root, format="parquet", partitioning=self.partition_by,
+            partitioning_flavor="hive", basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore")
+        self.rows_written += len(self.rows)
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+
+def read_dataset(root):
+    import pyarrow.dataset as ds
+    return ds.dataset(root, format="parquet", partitioning="hive")
+
+
+def repos_using(root, services):
+    """URLs of the repos where every one of services was found, for specs like "cache=redis" or "aws_sqs"."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    wanted = [spec.partition("=") for spec in services]
+    matches = []
+    for service, has_value, value in wanted:
+        match = ds.field("service") == service
+        if has_value:
+            match = match & (ds.field("value") == value)
+        matches.append(match)
+    table = read_dataset(root).to_table(columns=["repo_url", "service", "value"],
+                                        filter=functools.reduce(operator.or_, matches))
+    # One boolean column per wanted service, then per repo whether any of its rows set it
+    columns = {"repo_url": table["repo_url"]}
+    for index, (service, has_value, value) in enumerate(wanted):
+        match = pc.equal(table["service"], service)
+        if has_value:
+            match = pc.and_(match, pc.equal(table["value"], value))
+        columns[f"match_{index}"] = pc.fill_null(match, False)
+    grouped = pa.table(columns).group_by("repo_url").aggregate(
+        [(f"match_{index}", "any") for index in range(len(wanted))])
+    found = functools.reduce(pc.and_, (grouped[f"match_{index}_any"] for index in range(len(wanted))))
+    return sorted(grouped.filter(found)["repo_url"].to_pylist())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export discovery results to Parquet and query them.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="append batch_discovery JSONL results to a Parquet dataset")
+    export.add_argument("results", help="JSONL file written by batch_discovery.py, - for stdin")
+    export.add_argument("root", help="dataset directory")
+    query = commands.add_parser("query", help="list repos where all the given services were found")
+    query.add_argument("root", help="dataset directory")
+    query.add_argument("services", nargs="+", metavar="SERVICE[=VALUE]")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        source = sys.stdin if args.results == "-" else open(args.results, "r", encoding="utf-8")
+        with source, ParquetDatasetWriter(args.root) as writer:
+            for line in source:
+                if line.strip() and (result := json.loads(line)).get("error") is None:
+                    writer.append(result)
+        print(f"Appended {writer.rows_written} rows to {args.root}", file=sys.stderr)
+    else:
+        for url in repos_using(args.root, args.services):
+            print(url)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
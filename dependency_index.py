@@ -0,0 +1,114 @@
+"""Package names declared by dependency manifests and lockfiles, and the index they are looked up in.
+
+Each *_packages() function yields the normalized names of the packages a file declares, in a
+single pass and without resolving versions: requirements files (extras, markers, options and
+-r/-c lines are skipped), package.json, package-lock.json / npm-shrinkwrap.json (v1 to v3),
+yarn.lock (classic and berry), poetry.lock and Pipfile.lock. Development-only packages are
+skipped where the file marks them.
+
+PackageIndex normalizes the keys of a {package: value} table once, so every dependency costs
+one dict lookup however large the table or the lockfile is. Python names follow PEP 503;
+npm names are case-insensitive, scopes included.
+"""
+import json
+import re
+
+# PEP 503: runs of "-", "_" and "." are equivalent and names compare case-insensitively
+PYTHON_SEPARATORS = re.compile(r"[-_.]+")
+
+# Name at the start of a requirement line: "Redis[hiredis]>=4 ; python_version > '3.8'"
+REQUIREMENT_NAME = re.compile(r"[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?")
+EGG_NAME = re.compile(r"#egg=([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+# Entry headers of yarn.lock, e.g. `"@babel/core@^7.0.0", "@babel/core@^7.1.0":` or `lodash@npm:^4.17.21:`
+YARN_ENTRY = re.compile(r'^"?(@?[^@\s",]+)@', re.MULTILINE)
+
+# poetry writes name as the first key of every [[package]] table; before poetry 1.5 the table also
+# has a category, "dev" for development-only packages
+POETRY_PACKAGE = re.compile(r'^\[\[package\]\]\s*\nname\s*=\s*"([^"]+)"', re.MULTILINE)
+POETRY_DEV_CATEGORY = re.compile(r'^category\s*=\s*"dev"', re.MULTILINE)
+
+
+def normalize_python(name):
+    return PYTHON_SEPARATORS.sub("-", name).lower()
+
+
+def normalize_npm(name):
+    return name.strip().lower()
+
+
+class PackageIndex:
+    def __init__(self, table, normalize):
+        self.normalize = normalize
+        self.table = {normalize(package): value for package, value in table.items()}
+
+    def get(self, normalized_name):
+        return self.table.get(normalized_name)
+
+    def __len__(self):
+        return len(self.table)
+
+
+def requirements_packages(file_content):
+    """Names required by a pip requirements file; -r/-c includes and other options are skipped."""
+    for line in file_content.replace("\\\n", " ").splitlines():
+        line = line.split(" #", 1)[0].strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("-"):
+            # Editable installs name their package in the #egg fragment
+            if line.startswith(("-e", "--editable")) and (match := EGG_NAME.search(line)):
+                yield normalize_python(match.group(1))
+            continue
+        if "://" in line.split("@", 1)[0] or line.startswith((".", "/")):
+            # A bare URL or path; its name isn't known without building it
+            continue
+        if match := REQUIREMENT_NAME.match(line):
+            yield normalize_python(match.group())
+
+
+def package_json_packages(file_content):
+    """Runtime dependencies of a package.json."""
+    dependencies = json.loads(file_content).get("dependencies") or {}
+    for name in dependencies:
+        yield normalize_npm(name)
+
+
+def package_lock_packages(file_content):
+    """Packages of a package-lock.json or npm-shrinkwrap.json, except dev-only ones."""
+    lock = json.loads(file_content)
+    if packages := lock.get("packages"):
+        # lockfileVersion 2 and 3: "node_modules/a/node_modules/@scope/b" paths
+        for path, package in packages.items():
+            if path and not package.get("dev") and "node_modules/" in path:
+                yield normalize_npm(path.rsplit("node_modules/", 1)[1])
+        return
+    # lockfileVersion 1: nested dependencies
+    pending = [lock.get("dependencies") or {}]
+    while pending:
+        for name, package in pending.pop().items():
+            if not package.get("dev"):
+                yield normalize_npm(name)
+            if package.get("dependencies"):
+                pending.append(package["dependencies"])
+
+
+def yarn_lock_packages(file_content):
+    for match in YARN_ENTRY.finditer(file_content):
+        if match.group(1) != "__metadata":
+            yield normalize_npm(match.group(1))
+
+
+def poetry_lock_packages(file_content):
+    """Packages of a poetry.lock, except those in the dev category."""
+    for match in POETRY_PACKAGE.finditer(file_content):
+        # The package's own keys end where its first subtable, or the next package, starts
+        end = file_content.find("\n[", match.end())
+        if not POETRY_DEV_CATEGORY.search(file_content, match.end(), len(file_content) if end == -1 else end):
+            yield normalize_python(match.group(1))
+
+
+def pipfile_lock_packages(file_content):
+    """Packages of the default (non-develop) section of a Pipfile.lock."""
+    for name in json.loads(file_content).get("default") or {}:
+        yield normalize_python(name)
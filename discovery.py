@@ -0,0 +1,879 @@
+"""Service discovery core: Services, Githubdisovery and the clone/read helpers.
+
+Kept free of the UI and diagram stacks (streamlit, diagrams/graphviz) so headless discovery
+imports quickly; GitPython and the process pool are imported only where they are used.
+"""
+import contextlib
+import hashlib
+import io
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import dependency_index
+import docker_analyzer
+import iac_analyzer
+import js_analyzer
+import nginx_analyzer
+import parse_cache
+import parser_registry
+import py_ast_analyzer
+import repo_walk
+
+
+class Services:
+    WEB_SERVER = "web_server"
+    LOAD_BALANCER = "lb"
+    MQ = "message_queue"
+    AWS_CLOUDTRAIL = "aws_cloudtrail"
+    AWS_LAMBDA = "aws_lambda"
+    CACHE = "cache"
+    DATABASE = "database"
+    DOCKER = "docker"
+    APP_SERVER = "app_server"
+    AWS_SERVICE = "aws_service"
+    AWS_SQS = "aws_sqs"
+    AWS_SNS = "aws_sns"
+    AWS_RDS = "aws_rds"
+    AWS_S3 = "aws_s3"
+    STATIC_CONTENT= "static_content"
+    SEARCH = "search"
+    INFRASTRUCTURE = "infrastructure"
+
+
+# AWS services discovered from boto3, keyed by the service name passed to client()/resource();
+# the AWS SDK for JavaScript names its clients the same way
+BOTO3_SERVICES = {"s3": Services.AWS_S3, "sqs": Services.AWS_SQS, "sns": Services.AWS_SNS, "rds": Services.AWS_RDS,
+                  "lambda": Services.AWS_LAMBDA, "cloudtrail": Services.AWS_CLOUDTRAIL}
+
+# boto3.client('s3'), boto3.resource("sqs"), session.client(region_name="us-east-1", service_name='sns'), ...
+# Any service name is captured and looked up in BOTO3_SERVICES, so the scan cost doesn't grow with the table.
+# service_name= is found after other arguments as long as none of them contains parentheses.
+BOTO3_CALL_PATTERN = re.compile(r"""\.\s*(?:client|resource)\s*\(\s*(?:[^()]*?\bservice_name\s*=\s*)?['"]([\w-]+)['"]""")
+BOTO3_CALL_BYTES_PATTERN = re.compile(BOTO3_CALL_PATTERN.pattern.encode("ascii"))
+# What the call is made on, right before the dot: boto3, a session (session, self._session, boto_session)
+# or a session just created (boto3.Session(...), get_session()). Only the BOTO3_RECEIVER_WINDOW characters
+# before each call are searched, so the scan stays anchored on the rare .client( / .resource( calls.
+BOTO3_RECEIVER_PATTERN = re.compile(r"(?:\bboto3|session\w*|session\s*\([^()]*\))\s*$", re.IGNORECASE)
+BOTO3_RECEIVER_BYTES_PATTERN = re.compile(BOTO3_RECEIVER_PATTERN.pattern.encode("ascii"), re.IGNORECASE)
+BOTO3_RECEIVER_WINDOW = 80
+
+# Services discovered from Python client library imports by the AST analyzer
+PYTHON_LIBRARY_SERVICES = {
+    "redis": (Services.CACHE, "redis"),
+    "pymongo": (Services.DATABASE, "mongodb"),
+    "psycopg2": (Services.DATABASE, "postgres"),
+    "kafka": (Services.MQ, "kafka"),
+    "pika": (Services.MQ, "rabbitmq"),
+}
+
+# Services discovered from declared dependencies, by client library. Curated rather than exhaustive:
+# the drivers, ODMs and framework integrations that imply a service, about 140 packages.
+PYTHON_PACKAGE_SERVICES = dependency_index.PackageIndex({
+    **dict.fromkeys(["mysqlclient", "pymysql", "mysql-connector-python", "mysql-connector", "aiomysql", "asyncmy",
+                     "mysql-python", "django-mysql"], (Services.DATABASE, "mysql")),
+    **dict.fromkeys(["psycopg2", "psycopg2-binary", "psycopg", "psycopg-binary", "psycopg-pool", "asyncpg", "pg8000",
+                     "aiopg", "postgres", "py-postgresql", "sqlalchemy-postgres"], (Services.DATABASE, "postgres")),
+    **dict.fromkeys(["pymongo", "motor", "mongoengine", "flask-mongoengine", "flask-pymongo", "djongo", "beanie",
+                     "odmantic", "umongo"], (Services.DATABASE, "mongodb")),
+    **dict.fromkeys(["cassandra-driver", "scylla-driver", "django-cassandra-engine"], (Services.DATABASE, "cassandra")),
+    **dict.fromkeys(["neo4j", "py2neo", "neomodel"], (Services.DATABASE, "neo4j")),
+    **dict.fromkeys(["cx-oracle", "oracledb"], (Services.DATABASE, "oracle")),
+    **dict.fromkeys(["pyodbc", "pymssql", "mssql-django"], (Services.DATABASE, "mssql")),
+    **dict.fromkeys(["couchbase"], (Services.DATABASE, "couchbase")),
+    **dict.fromkeys(["pynamodb"], (Services.DATABASE, "dynamodb")),
+    **dict.fromkeys(["redis", "hiredis", "aioredis", "redis-py-cluster", "django-redis", "flask-redis", "redis-om",
+                     "rq", "fakeredis", "walrus", "coredis"], (Services.CACHE, "redis")),
+    **dict.fromkeys(["pymemcache", "python-memcached", "pylibmc", "aiomcache", "django-pylibmc"],
+                    (Services.CACHE, "memcached")),
+    **dict.fromkeys(["kafka-python", "kafka-python-ng", "confluent-kafka", "aiokafka", "faust", "faust-streaming"],
+                    (Services.MQ, "kafka")),
+    **dict.fromkeys(["pika", "aio-pika", "aiormq", "rabbitpy", "amqpstorm", "librabbitmq"], (Services.MQ, "rabbitmq")),
+    **dict.fromkeys(["nats-py", "asyncio-nats-client"], (Services.MQ, "nats")),
+    **dict.fromkeys(["pulsar-client"], (Services.MQ, "pulsar")),
+    **dict.fromkeys(["elasticsearch", "elasticsearch-dsl", "elasticsearch7", "elasticsearch8", "elastic-transport",
+                     "django-elasticsearch-dsl"], (Services.SEARCH, "elasticsearch")),
+    **dict.fromkeys(["opensearch-py", "opensearch-dsl"], (Services.SEARCH, "opensearch")),
+    **dict.fromkeys(["pysolr", "django-haystack"], (Services.SEARCH, "solr")),
+    **dict.fromkeys(["meilisearch"], (Services.SEARCH, "meilisearch")),
+    **dict.fromkeys(["typesense"], (Services.SEARCH, "typesense")),
+    **dict.fromkeys(["algoliasearch"], (Services.SEARCH, "algolia")),
+}, dependency_index.normalize_python)
+
+NPM_PACKAGE_SERVICES = dependency_index.PackageIndex({
+    **dict.fromkeys(["mysql", "mysql2", "promise-mysql", "@mikro-orm/mysql"], (Services.DATABASE, "mysql")),
+    **dict.fromkeys(["pg", "pg-promise", "postgres", "pg-pool", "@neondatabase/serverless", "@mikro-orm/postgresql",
+                     "slonik"], (Services.DATABASE, "postgres")),
+    **dict.fromkeys(["mongodb", "mongoose", "monk", "mongojs", "@typegoose/typegoose", "@nestjs/mongoose",
+                     "@mikro-orm/mongodb"], (Services.DATABASE, "mongodb")),
+    **dict.fromkeys(["cassandra-driver"], (Services.DATABASE, "cassandra")),
+    **dict.fromkeys(["neo4j-driver"], (Services.DATABASE, "neo4j")),
+    **dict.fromkeys(["oracledb"], (Services.DATABASE, "oracle")),
+    **dict.fromkeys(["mssql", "tedious"], (Services.DATABASE, "mssql")),
+    **dict.fromkeys(["dynamoose", "@aws-sdk/client-dynamodb", "@aws-sdk/lib-dynamodb"], (Services.DATABASE, "dynamodb")),
+    **dict.fromkeys(["redis", "ioredis", "@redis/client", "connect-redis", "bull", "bullmq", "cache-manager-redis-store",
+                     "@nestjs/bull", "@upstash/redis", "redis-om"], (Services.CACHE, "redis")),
+    **dict.fromkeys(["memcached", "memjs", "memcache-client"], (Services.CACHE, "memcached")),
+    **dict.fromkeys(["kafkajs", "node-rdkafka", "@confluentinc/kafka-javascript", "kafka-node"], (Services.MQ, "kafka")),
+    **dict.fromkeys(["amqplib", "amqp-connection-manager", "rascal", "@golevelup/nestjs-rabbitmq"],
+                    (Services.MQ, "rabbitmq")),
+    **dict.fromkeys(["nats"], (Services.MQ, "nats")),
+    **dict.fromkeys(["pulsar-client"], (Services.MQ, "pulsar")),
+    **dict.fromkeys(["@elastic/elasticsearch", "elasticsearch", "@nestjs/elasticsearch"],
+                    (Services.SEARCH, "elasticsearch")),
+    **dict.fromkeys(["@opensearch-project/opensearch"], (Services.SEARCH, "opensearch")),
+    **dict.fromkeys(["solr-client"], (Services.SEARCH, "solr")),
+    **dict.fromkeys(["meilisearch"], (Services.SEARCH, "meilisearch")),
+    **dict.fromkeys(["typesense"], (Services.SEARCH, "typesense")),
+    **dict.fromkeys(["algoliasearch"], (Services.SEARCH, "algolia")),
+}, dependency_index.normalize_npm)
+
+# Keywords in the command a Dockerfile's final stage runs, checked in order; the first match wins
+DOCKER_APP_SERVER_COMMANDS = [("npm", "Nodejs"), ("flask", "Flask"), ("django", "Django")]
+DOCKER_MQ_COMMANDS = [("start-kafka", "kafka"), ("rabbitmq", "rabbitmq")]
+
+# Services run from well-known images, keyed by docker_analyzer.image_name(); message queues
+# are reported as the docker message_queue like the Dockerfile commands above
+IMAGE_SERVICES = {
+    "redis": (Services.CACHE, "redis"),
+    "memcached": (Services.CACHE, "memcached"),
+    "mysql": (Services.DATABASE, "mysql"),
+    "mariadb": (Services.DATABASE, "mysql"),
+    "postgres": (Services.DATABASE, "postgres"),
+    "mongo": (Services.DATABASE, "mongodb"),
+    "kafka": (Services.MQ, "kafka"),
+    "cp-kafka": (Services.MQ, "kafka"),
+    "rabbitmq": (Services.MQ, "rabbitmq"),
+}
+
+# Services provisioned by resources declared as infrastructure as code, keyed by CloudFormation
+# type (iac_analyzer.cloudformation_type() maps Terraform types); "enabled" values are flags
+IAC_RESOURCE_SERVICES = {
+    "AWS::SQS::Queue": (Services.AWS_SQS, "enabled"),
+    "AWS::SNS::Topic": (Services.AWS_SNS, "enabled"),
+    "AWS::S3::Bucket": (Services.AWS_S3, "enabled"),
+    "AWS::RDS::DBInstance": (Services.AWS_RDS, "enabled"),
+    "AWS::RDS::DBCluster": (Services.AWS_RDS, "enabled"),
+    "AWS::Lambda::Function": (Services.AWS_LAMBDA, "enabled"),
+    "AWS::Serverless::Function": (Services.AWS_LAMBDA, "enabled"),
+    "AWS::CloudTrail::Trail": (Services.AWS_CLOUDTRAIL, "enabled"),
+    "AWS::DynamoDB::Table": (Services.DATABASE, "dynamodb"),
+    "AWS::ElastiCache::CacheCluster": (Services.CACHE, "elasticache"),
+    "AWS::ElastiCache::ReplicationGroup": (Services.CACHE, "elasticache"),
+    "AWS::MSK::Cluster": (Services.MQ, "kafka"),
+    "AWS::AmazonMQ::Broker": (Services.MQ, "amazonmq"),
+    "AWS::Kinesis::Stream": (Services.MQ, "kinesis"),
+    "AWS::OpenSearchService::Domain": (Services.SEARCH, "opensearch"),
+    "AWS::Elasticsearch::Domain": (Services.SEARCH, "elasticsearch"),
+}
+
+# Files handed to a worker process at a time by discover_services_in_repo_parallel
+PARSE_BATCH_SIZE = 256
+
+# Files over this size are skipped, they are generated or vendored rather than hand-written
+MAX_FILE_BYTES = 2 * 1024 * 1024
+
+# Lockfiles are generated and often large, but they are exactly what the dependency parsers read
+MAX_LOCKFILE_BYTES = 64 * 1024 * 1024
+
+# CloudFormation templates, CDK output and Kubernetes manifests routinely run to several megabytes
+MAX_TEMPLATE_BYTES = 16 * 1024 * 1024
+
+# Bump whenever a parse_from_* method changes what it discovers, so cached fragments are not reused
+PARSER_VERSION = 11
+
+# Spec of the parser for a file, or None when no parser reads it
+def parser_for_file(filename):
+    spec = PARSER_REGISTRY.lookup(filename)
+    return spec if spec is not None and spec.is_parser else None
+
+class Githubdisovery():
+    def __init__(self, parse_cache=None, python_ast=False, max_file_bytes=MAX_FILE_BYTES,
+                 deny_dirs=repo_walk.DEFAULT_DENY_DIRS, record_files=False):
+        self.services_discovered = {}
+        # With record_files, the fragment each file contributed, keyed by its path in the repo
+        self.file_fragments = {} if record_files else None
+        self.parse_cache = parse_cache
+        # Analyze .py files with py_ast_analyzer instead of the boto3 call pattern
+        self.python_ast = python_ast
+        # Larger files are skipped without being read
+        self.max_file_bytes = max_file_bytes
+        # Directory names never descended into, on top of what .gitignore files exclude
+        self.deny_dirs = deny_dirs
+        self.walk_stats = repo_walk.new_walk_stats()
+
+    def result(self):
+        # services_discovered as an immutable discovery_model.Discovery
+        from discovery_model import Discovery
+        return Discovery.from_dict(self.services_discovered)
+
+    def with_same_options(self):
+        return Githubdisovery(self.parse_cache, self.python_ast, self.max_file_bytes, self.deny_dirs)
+
+    def dispatch_for(self, filename):
+        spec = PARSER_REGISTRY.lookup(filename)
+        if spec is PY_FILES_PARSER and self.python_ast:
+            return PY_FILES_AST_PARSER
+        return spec
+
+    def parse_from_docker_file(self, file_content: str):
+        # Only the ENTRYPOINT and CMD the final stage runs count, whichever form they are written in
+        analyzed = docker_analyzer.analyze_dockerfile(file_content)
+        docker = {}
+        fragment = {Services.DOCKER: docker}
+        if analyzed["base_images"]:
+            docker["base_images"] = analyzed["base_images"]
+        command = " ".join((docker_analyzer.command_line(analyzed["entrypoint"]),
+                            docker_analyzer.command_line(analyzed["cmd"])))
+        # Listed, so each Dockerfile of a repo adds its app server rather than replacing the last one
+        for service, keywords in ((Services.APP_SERVER, DOCKER_APP_SERVER_COMMANDS),
+                                  (Services.MQ, DOCKER_MQ_COMMANDS)):
+            for keyword, value in keywords:
+                if keyword in command:
+                    docker[service] = [value]
+                    break
+        if analyzed["final_image"]:
+            add_image_services(fragment, analyzed["final_image"])
+        self.merge_fragment(fragment)
+        return
+
+
+    def parse_from_docker_compose(self, file_content: str):
+        docker = {}
+        fragment = {Services.DOCKER: docker}
+        compose_services = docker_analyzer.analyze_compose(file_content)
+        if compose_services:
+            docker["services"] = compose_services
+            for compose_service in compose_services.values():
+                if "image" in compose_service:
+                    add_image_services(fragment, compose_service["image"])
+        self.merge_fragment(fragment)
+        return
+
+
+    def parse_from_nginx_conf(self, file_content: str):
+        # Upstreams and proxy_pass hosts merge across files, so a proxy_pass finds the upstream an
+        # included file defines; servers and servers_count are derived from them in merge_fragment
+        analysis = nginx_analyzer.analyze_config(file_content)
+        if analysis is None or not (analysis["upstreams"] or analysis["proxy_pass"]):
+            return
+        lb = {"upstreams": {name: {address: dict(server) for address, server in servers.items()}
+                            for name, servers in analysis["upstreams"].items()}}
+        if analysis["proxy_pass"]:
+            lb["proxy_pass"] = list(analysis["proxy_pass"])
+        self.merge_fragment({Services.LOAD_BALANCER: lb})
+        return
+
+    def parse_from_package_json(self, file_content: str):
+        self.services_discovered[Services.APP_SERVER] = "NodeJs"
+        self.record_packages(dependency_index.package_json_packages(file_content), NPM_PACKAGE_SERVICES)
+        return
+
+    def parse_from_requirements_txt(self, file_content: str):
+        self.record_packages(dependency_index.requirements_packages(file_content), PYTHON_PACKAGE_SERVICES)
+        return
+
+    def parse_from_package_lock(self, file_content: str):
+        self.record_packages(dependency_index.package_lock_packages(file_content), NPM_PACKAGE_SERVICES)
+
+    def parse_from_yarn_lock(self, file_content: str):
+        self.record_packages(dependency_index.yarn_lock_packages(file_content), NPM_PACKAGE_SERVICES)
+
+    def parse_from_poetry_lock(self, file_content: str):
+        self.record_packages(dependency_index.poetry_lock_packages(file_content), PYTHON_PACKAGE_SERVICES)
+
+    def parse_from_pipfile_lock(self, file_content: str):
+        self.record_packages(dependency_index.pipfile_lock_packages(file_content), PYTHON_PACKAGE_SERVICES)
+
+    def record_packages(self, packages, index):
+        # Each service value is reported once per file, however many of its packages are declared
+        found = {}
+        for package in packages:
+            if (entry := index.get(package)) is not None:
+                found.setdefault(entry[0], {})[entry[1]] = None
+        self.merge_fragment({service: list(values) for service, values in found.items()})
+
+    def parse_from_terraform(self, file_content: str):
+        self.record_resources(iac_analyzer.analyze_terraform(file_content), file_content)
+
+    def parse_from_yaml_manifest(self, file_content):
+        # CloudFormation templates and Kubernetes manifests; any other YAML is rejected unparsed
+        if iac_analyzer.is_manifest(file_content):
+            self.record_resources(iac_analyzer.analyze_yaml_manifest(file_content), file_content)
+
+    def parse_from_json_template(self, file_content):
+        # CloudFormation templates, CDK's cdk.out/*.template.json and Kubernetes manifests
+        if iac_analyzer.is_manifest(file_content):
+            self.record_resources(iac_analyzer.analyze_json_manifest(file_content), file_content)
+
+    def record_resources(self, resources, file_content):
+        # Declared resources are kept under infrastructure and report the services they provision.
+        # Files may declare the same address (two Terraform modules, two stacks), so each address holds
+        # a list of declarations, each with a digest of its file's content to resolve its references in
+        if not resources:
+            return
+        if isinstance(file_content, str):
+            file_content = file_content.encode("utf-8", "surrogateescape")
+        file = hashlib.blake2b(file_content, digest_size=8).hexdigest()
+        fragment = {Services.INFRASTRUCTURE: {address: [dict(resource, file=file)]
+                                              for address, resource in resources.items()}}
+        for resource in resources.values():
+            if resource["source"] == iac_analyzer.SOURCE_KUBERNETES:
+                for image in resource.get("images", []):
+                    add_image_services(fragment, image)
+            elif found := IAC_RESOURCE_SERVICES.get(iac_analyzer.cloudformation_type(resource["type"])):
+                service, value = found
+                if value == "enabled":
+                    fragment[service] = value
+                elif value not in fragment.setdefault(service, []):
+                    fragment[service].append(value)
+        self.merge_fragment(fragment)
+
+    def parse_from_py_files(self, file_content):
+        services_discovered = self.services_discovered
+        # Fetch from boto3 client/resource access for AWS, in a single pass over the file.
+        # Similarly fetch for Azure services as well with appropriate key_words with respective cloud call
+        for name in boto3_service_names(file_content):
+            if service := BOTO3_SERVICES.get(name):
+                services_discovered[service] = "enabled"
+
+        return
+
+    def parse_from_py_files_ast(self, file_content):
+        # Resolves imports, aliases and constants, and ignores comments; sources that fail the cheap
+        # prefilter are never parsed, sources that don't parse fall back to the pattern scan
+        services_discovered = self.services_discovered
+        found = py_ast_analyzer.analyze_python_source(file_content)
+        if found is None:
+            return self.parse_from_py_files(file_content)
+        for kind, name in found:
+            if kind == "boto3":
+                if service := BOTO3_SERVICES.get(name):
+                    services_discovered[service] = "enabled"
+            elif kind == "import":
+                service, value = PYTHON_LIBRARY_SERVICES[name]
+                discovered_entities = services_discovered.setdefault(service, [])
+                if value not in discovered_entities:
+                    discovered_entities.append(value)
+        return
+
+    def parse_from_js_files(self, file_content):
+        # Any JavaScript or TypeScript source still marks a web server; minified bundles are not scanned
+        services_discovered = self.services_discovered
+        services_discovered[Services.WEB_SERVER] = "enabled"
+        analyzed = js_analyzer.analyze_js_source(file_content)
+        if analyzed is None:
+            return
+        modules, constructed = analyzed
+        packages = {js_analyzer.package_name(module) for module in modules} - {None}
+        self.record_packages(map(dependency_index.normalize_npm, packages), NPM_PACKAGE_SERVICES)
+        for module in modules:
+            # @aws-sdk/client-sqs (v3) and aws-sdk/clients/sqs (v2)
+            for prefix in ("@aws-sdk/client-", "aws-sdk/clients/"):
+                if module.startswith(prefix) and (service := BOTO3_SERVICES.get(module[len(prefix):])):
+                    services_discovered[service] = "enabled"
+        if any(package == "aws-sdk" or package.startswith("@aws-sdk/") for package in packages):
+            # new AWS.SQS() (v2) or new SQSClient() (v3)
+            for name in constructed:
+                if service := BOTO3_SERVICES.get(name.removesuffix("Client").lower()):
+                    services_discovered[service] = "enabled"
+        return
+
+
+    def discover_file(self, filename, load_content, load_blob_sha=None):
+        # load_content(binary, max_bytes) is only called for files one of the parsers reads;
+        # it returns None for files over max_bytes or binary
+        spec = self.dispatch_for(filename)
+        if spec is None:
+            return
+        elif not spec.is_parser:
+            self.merge_fragment(spec.fragment)
+        elif self.parse_cache is None or load_blob_sha is None:
+            if (file_content := load_content(spec.reads_bytes, self.size_limit(spec))) is not None:
+                try:
+                    spec.parse(self, file_content)
+                finally:
+                    close_content(file_content)
+            else:
+                self.walk_stats["files_skipped"] += 1
+        else:
+            blob_sha = load_blob_sha()
+            fragment = self.parse_cache.get(PARSER_VERSION, spec.cache_key, blob_sha)
+            if fragment is None:
+                if (file_content := load_content(spec.reads_bytes, self.size_limit(spec))) is None:
+                    self.walk_stats["files_skipped"] += 1
+                    return
+                try:
+                    fragment = self.parse_fragment(spec, file_content)
+                finally:
+                    close_content(file_content)
+                self.parse_cache.put(PARSER_VERSION, spec.cache_key, blob_sha, fragment)
+            self.merge_fragment(fragment)
+
+    def size_limit(self, spec):
+        return spec.max_file_bytes or self.max_file_bytes
+
+    def file_fragment(self, filename, load_content, load_blob_sha=None):
+        # What discover_file would add for this file, kept apart from the running result
+        discovery = self.with_same_options()
+        discovery.discover_file(filename, load_content, load_blob_sha)
+        self.walk_stats["files_skipped"] += discovery.walk_stats["files_skipped"]
+        return discovery.services_discovered
+
+    def discover_recorded_file(self, path, filename, load_content, load_blob_sha=None):
+        # discover_file, keeping what the file contributed in file_fragments
+        fragment = self.file_fragment(filename, load_content, load_blob_sha)
+        self.record_fragment(path, fragment)
+
+    def record_fragment(self, path, fragment):
+        if fragment:
+            self.file_fragments[path] = fragment
+        self.merge_fragment(fragment)
+
+    @staticmethod
+    def parse_fragment(spec, file_content):
+        # What a single file contributes on its own
+        discovery = Githubdisovery()
+        spec.parse(discovery, file_content)
+        return discovery.services_discovered
+
+    def merge_fragment(self, fragment):
+        # Same semantics as running the parser in place: lists accumulate (service names once each),
+        # dicts merge key by key, everything else is replaced
+        merge_services(self.services_discovered, fragment)
+        if Services.LOAD_BALANCER in fragment:
+            update_load_balancer_servers(self.services_discovered[Services.LOAD_BALANCER])
+
+# List all files in the repository
+    def discover_services_in_repo(self, directory, workers=None, batch_size=PARSE_BATCH_SIZE):
+        if workers:
+            return self.discover_services_in_repo_parallel(directory, workers, batch_size)
+        for file_path, filename in repo_walk.walk_files(directory, self.deny_dirs, self.walk_stats):
+            load_content = lambda binary, max_bytes: read_file(file_path, binary, max_bytes)
+            load_blob_sha = lambda: parse_cache.file_blob_sha(file_path)
+            if self.file_fragments is None:
+                self.discover_file(filename, load_content, load_blob_sha)
+            else:
+                self.discover_recorded_file(os.path.relpath(file_path, directory), filename, load_content, load_blob_sha)
+        print(f"Walked {directory}: {self.walk_stats}")
+        return self.services_discovered
+
+    def discover_services_in_repo_parallel(self, directory, workers, batch_size=PARSE_BATCH_SIZE):
+        # Batches are parsed in worker processes; fragments are merged back in walk order,
+        # so the result is the same as the serial walk.
+        batches = []
+        batch = []
+        for file_path, filename in repo_walk.walk_files(directory, self.deny_dirs, self.walk_stats):
+            if parser_for_file(filename) is None:
+                if self.file_fragments is None:
+                    self.discover_file(filename, None)
+                else:
+                    self.discover_recorded_file(os.path.relpath(file_path, directory), filename, None)
+                continue
+            batch.append(file_path)
+            if len(batch) == batch_size:
+                batches.append(batch)
+                batch = []
+        if batch:
+            batches.append(batch)
+
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        cache_path = self.parse_cache.path if self.parse_cache is not None else None
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_parse_worker,
+                                 initargs=(cache_path, self.python_ast, self.max_file_bytes)) as pool:
+            for batch, (fragments, files_skipped) in zip(batches, pool.map(_parse_batch, batches)):
+                self.walk_stats["files_skipped"] += files_skipped
+                for file_path, fragment in zip(batch, fragments):
+                    if self.file_fragments is None:
+                        self.merge_fragment(fragment)
+                    else:
+                        self.record_fragment(os.path.relpath(file_path, directory), fragment)
+        print(f"Walked {directory}: {self.walk_stats}")
+        return self.services_discovered
+
+    def discover_services_in_git_tree(self, repo_path, rev="HEAD"):
+        # Reads blobs straight from the object database, so bare repos and mirrors work without a checkout
+        from git import Repo
+        started = time.perf_counter()
+        tree = Repo(repo_path).commit(rev).tree
+        self.walk_stats["walk_seconds"] += time.perf_counter() - started
+        items = tree.traverse(predicate=lambda i, d: i.type == "blob" and i.mode != SYMLINK_MODE,
+                              prune=lambda i, d: i.type == "tree" and i.name in self.deny_dirs)
+        for item in repo_walk.timed(items, self.walk_stats):
+            self.walk_stats["files_visited"] += 1
+            load_content = lambda binary, max_bytes: read_blob(item, binary, max_bytes)
+            if self.file_fragments is None:
+                self.discover_file(item.name, load_content, lambda: item.hexsha)
+            else:
+                self.discover_recorded_file(item.path, item.name, load_content, lambda: item.hexsha)
+        print(f"Walked {repo_path}@{rev}: {self.walk_stats}")
+        return self.services_discovered
+
+def boto3_service_names(file_content):
+    """Service names passed to client() or resource() of boto3 or a boto3 session, in a str or bytes source."""
+    if isinstance(file_content, str):
+        call_pattern, receiver_pattern = BOTO3_CALL_PATTERN, BOTO3_RECEIVER_PATTERN
+    else:
+        call_pattern, receiver_pattern = BOTO3_CALL_BYTES_PATTERN, BOTO3_RECEIVER_BYTES_PATTERN
+    for match in call_pattern.finditer(file_content):
+        if receiver_pattern.search(file_content, max(0, match.start() - BOTO3_RECEIVER_WINDOW), match.start()):
+            name = match.group(1)
+            yield name if isinstance(name, str) else name.decode("ascii")
+
+# Nested lists of service names, such as docker's app servers, deduplicated like top-level lists
+LISTED_ONCE_KEYS = {Services.APP_SERVER, Services.MQ}
+
+def merge_services(services_discovered, fragment, top_level=True):
+    for key, value in fragment.items():
+        if isinstance(value, list):
+            merged = services_discovered.setdefault(key, [])
+            if top_level or key in LISTED_ONCE_KEYS:
+                # Service names are listed once, however many files report them (a manifest and its lockfile)
+                for item in value:
+                    if item not in merged:
+                        merged.append(item)
+            else:
+                merged.extend(value)
+        elif isinstance(value, dict) and isinstance(services_discovered.get(key), dict):
+            merge_services(services_discovered[key], value, False)
+        elif isinstance(value, dict):
+            services_discovered[key] = {}
+            merge_services(services_discovered[key], value, False)
+        else:
+            services_discovered[key] = value
+
+def load_balancer_servers(lb):
+    """Servers behind a load balancer, or None without one.
+
+    These are the servers of the upstreams proxy_pass sends to, plus hosts it sends to directly.
+    When proxy_pass names no upstream, every upstream counts. Upstreams and their servers come in
+    sorted order, so the result doesn't depend on the order files were merged in. Results without
+    upstreams or proxy_pass keep the servers they list.
+    """
+    if not lb:
+        return None
+    upstreams = lb.get("upstreams") or {}
+    proxied = lb.get("proxy_pass") or []
+    if not upstreams and not proxied:
+        return list(lb["servers"]) if "servers" in lb else None
+    names = sorted(name for name in upstreams if name.lower() in proxied) or sorted(upstreams)
+    servers = []
+    for name in names:
+        servers.extend(address for address in sorted(upstreams[name]) if address not in servers)
+    upstream_names = {name.lower() for name in upstreams}
+    servers.extend(host for host in sorted(set(proxied) - upstream_names) if host not in servers)
+    return servers
+
+def update_load_balancer_servers(lb):
+    if lb.get("upstreams") or lb.get("proxy_pass"):
+        lb["servers"] = load_balancer_servers(lb)
+        lb["servers_count"] = len(lb["servers"])
+
+def add_image_services(fragment, image):
+    # Adds the service a well-known image runs to a parser's fragment
+    found = IMAGE_SERVICES.get(docker_analyzer.image_name(image))
+    if found is None:
+        return
+    service, value = found
+    if service == Services.MQ:
+        if value not in (queues := fragment.setdefault(Services.DOCKER, {}).setdefault(Services.MQ, [])):
+            queues.append(value)
+    elif value not in fragment.setdefault(service, []):
+        fragment[service].append(value)
+
+# Built-in parsers; spec names double as parse cache keys. Packages can add more through the
+# parser_registry.ENTRY_POINT_GROUP entry points.
+PY_FILES_PARSER = parser_registry.ParserSpec(
+    "parse_from_py_files", ["*.py"], Githubdisovery.parse_from_py_files, reads_bytes=True)
+PY_FILES_AST_PARSER = parser_registry.ParserSpec(
+    "parse_from_py_files_ast", [], Githubdisovery.parse_from_py_files_ast, reads_bytes=True)
+PARSER_REGISTRY = parser_registry.ParserRegistry([
+    parser_registry.ParserSpec("parse_from_docker_file", ["Dockerfile", "Dockerfile.*", "*.dockerfile"],
+                               Githubdisovery.parse_from_docker_file),
+    parser_registry.ParserSpec("parse_from_docker_compose",
+                               ["docker-compose.yml", "docker-compose.yaml", "compose.yml", "compose.yaml",
+                                "docker-compose.*.yml", "docker-compose.*.yaml"],
+                               Githubdisovery.parse_from_docker_compose),
+    parser_registry.ParserSpec("parse_from_package_json", ["package.json"], Githubdisovery.parse_from_package_json,
+                               ignore_case=True),
+    parser_registry.ParserSpec("parse_from_requirements_txt",
+                               ["requirements.txt", "requirements*.txt", "requirements*.in"],
+                               Githubdisovery.parse_from_requirements_txt, ignore_case=True),
+    parser_registry.ParserSpec("parse_from_package_lock", ["package-lock.json", "npm-shrinkwrap.json"],
+                               Githubdisovery.parse_from_package_lock, max_file_bytes=MAX_LOCKFILE_BYTES),
+    parser_registry.ParserSpec("parse_from_yarn_lock", ["yarn.lock"], Githubdisovery.parse_from_yarn_lock,
+                               max_file_bytes=MAX_LOCKFILE_BYTES),
+    parser_registry.ParserSpec("parse_from_poetry_lock", ["poetry.lock"], Githubdisovery.parse_from_poetry_lock,
+                               max_file_bytes=MAX_LOCKFILE_BYTES),
+    parser_registry.ParserSpec("parse_from_pipfile_lock", ["Pipfile.lock"], Githubdisovery.parse_from_pipfile_lock,
+                               max_file_bytes=MAX_LOCKFILE_BYTES),
+    PY_FILES_PARSER,
+    PY_FILES_AST_PARSER,
+    parser_registry.ParserSpec("parse_from_nginx_conf", ["*.conf", "nginx.conf.template"],
+                               Githubdisovery.parse_from_nginx_conf, ignore_case=True),
+    parser_registry.ParserSpec("static_content", ["*.jpg", "*.jpeg", "*.png", "*.mpg", "*.mp4", "*.swf", "*.avi"],
+                               fragment={Services.STATIC_CONTENT: "enabled"}, ignore_case=True),
+    parser_registry.ParserSpec("parse_from_js_files",
+                               ["*.js", "*.mjs", "*.cjs", "*.jsx", "*.ts", "*.mts", "*.cts", "*.tsx"],
+                               Githubdisovery.parse_from_js_files, reads_bytes=True, ignore_case=True),
+    parser_registry.ParserSpec("parse_from_terraform", ["*.tf"], Githubdisovery.parse_from_terraform),
+    parser_registry.ParserSpec("parse_from_yaml_manifest", ["*.yaml", "*.yml", "*.template"],
+                               Githubdisovery.parse_from_yaml_manifest, reads_bytes=True, ignore_case=True,
+                               max_file_bytes=MAX_TEMPLATE_BYTES),
+    parser_registry.ParserSpec("parse_from_json_template", ["*.json"], Githubdisovery.parse_from_json_template,
+                               reads_bytes=True, ignore_case=True, max_file_bytes=MAX_TEMPLATE_BYTES),
+])
+
+_worker_discovery = None
+
+def _init_parse_worker(cache_path, python_ast, max_file_bytes):
+    global _worker_discovery
+    _worker_discovery = Githubdisovery(parse_cache.ParseCache(cache_path) if cache_path else None, python_ast,
+                                       max_file_bytes)
+
+def _parse_batch(file_paths):
+    fragments = []
+    _worker_discovery.walk_stats = repo_walk.new_walk_stats()
+    for file_path in file_paths:
+        fragments.append(_worker_discovery.file_fragment(
+            os.path.basename(file_path), lambda binary, max_bytes: read_file(file_path, binary, max_bytes),
+            lambda: parse_cache.file_blob_sha(file_path)))
+    return fragments, _worker_discovery.walk_stats["files_skipped"]
+
+WORKDIR_ROOT = "/tmp/testrepos"
+
+# Clone a repository
+def clone_repo(url, directory, fast=False):
+    import git.exc
+    from git import Repo
+    if os.path.exists(directory):
+        print(f"Repository already exists at {directory}")
+        return
+    if fast:
+        try:
+            fast_clone_repo(url, directory)
+            print(f"Fast cloned repository to {directory}")
+            return
+        except git.exc.GitCommandError as gce:
+            # Server (or local git) without partial clone / sparse checkout support
+            print(f"Fast clone failed for {url}, falling back to full clone: {gce.stderr.strip()}")
+            if os.path.exists(directory):
+                shutil.rmtree(directory)
+    Repo.clone_from(url, directory)
+    print(f"Cloned repository to {directory}")
+
+def fast_clone_repo(url, directory):
+    # Depth-1, single-branch, blobless clone; blobs are fetched lazily only for
+    # the paths matched by the sparse checkout.
+    from git import Repo
+    repo = Repo.clone_from(url, directory, depth=1, single_branch=True, filter="blob:none", no_checkout=True)
+    # Non-cone patterns for every file a registered parser reads
+    repo.git.sparse_checkout("set", "--no-cone", *PARSER_REGISTRY.patterns())
+    repo.git.checkout()
+    return repo
+
+# Read the content of a file
+# Returns None for files over max_bytes or that look binary. With binary=True the file is
+# memory-mapped rather than read, so scanning it doesn't pull the whole file into memory.
+def read_file(filepath, binary=False, max_bytes=MAX_FILE_BYTES):
+    size = os.path.getsize(filepath)
+    if size > max_bytes:
+        return None
+    with open(filepath, 'rb') as file:
+        if b"\0" in file.read(BINARY_SNIFF_BYTES):
+            return None
+        if binary:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        file.seek(0)
+        with io.TextIOWrapper(file, encoding="utf-8", errors="replace") as text:
+            content = text.read()
+    return content
+
+# Release the memory map read_file(binary=True) returns; other content needs no closing
+def close_content(file_content):
+    if isinstance(file_content, mmap.mmap):
+        file_content.close()
+
+# Leading bytes checked for NUL to tell binary files from text
+BINARY_SNIFF_BYTES = 8192
+
+SYMLINK_MODE = 0o120000
+
+# Read the content of a git blob, with the same limits and decoding as read_file
+def read_blob(blob, binary=False, max_bytes=MAX_FILE_BYTES):
+    if blob.size > max_bytes:
+        return None
+    data = blob.data_stream.read()
+    if b"\0" in data[:BINARY_SNIFF_BYTES]:
+        return None
+    if binary:
+        return data
+    with io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="replace") as file:
+        content = file.read()
+    return content
+
+
+# Declared resources build_aws_architecture places, inside the customer's VPC or directly in the cloud;
+# everything else declared (IAM roles, policies, subscriptions, ...) is left out of the diagram
+VPC_RESOURCE_TYPES = {
+    "AWS::EC2::Instance", "AWS::RDS::DBInstance", "AWS::RDS::DBCluster", "AWS::ElastiCache::CacheCluster",
+    "AWS::ElastiCache::ReplicationGroup", "AWS::ElasticLoadBalancingV2::LoadBalancer",
+    "AWS::ElasticLoadBalancing::LoadBalancer", "AWS::ECS::Service", "AWS::EKS::Cluster", "AWS::MSK::Cluster",
+    "AWS::AmazonMQ::Broker", "AWS::OpenSearchService::Domain", "AWS::Elasticsearch::Domain",
+}
+CLOUD_RESOURCE_TYPES = {
+    "AWS::SQS::Queue", "AWS::SNS::Topic", "AWS::S3::Bucket", "AWS::DynamoDB::Table", "AWS::Lambda::Function",
+    "AWS::Serverless::Function", "AWS::CloudTrail::Trail", "AWS::CloudFront::Distribution", "AWS::Kinesis::Stream",
+    "AWS::ApiGateway::RestApi", "AWS::ApiGatewayV2::Api",
+}
+
+def place_declared_resources(diagram, customer, aws_cloud, vpc, infrastructure):
+    # Adds a diagram resource per declaration of a resource and a link per reference between two
+    # placed ones. A reference goes to the declaration in the same file, or else to the only one.
+    # Returns the services ("AWS::SQS", ...) placed, which need no generic node of their own.
+    placed = {}
+    nodes = []
+    for address, declarations in sorted(infrastructure.items()):
+        for resource in sorted(declarations, key=lambda declaration: declaration.get("file", "")):
+            resource_type = iac_analyzer.cloudformation_type(resource["type"])
+            if resource_type in VPC_RESOURCE_TYPES:
+                parent = vpc
+            elif resource_type in CLOUD_RESOURCE_TYPES:
+                parent = aws_cloud
+            else:
+                continue
+            files = placed.setdefault(address, {})
+            if resource.get("file") in files:
+                # The same file found twice, e.g. a copy of a module
+                continue
+            name = f"{customer}_{re.sub(r'[^A-Za-z0-9]', '_', address)}"
+            if files:
+                name = f"{name}_{len(files) + 1}"
+            diagram["Resources"][name] = {"Type": resource_type}
+            parent["Children"].append(name)
+            files[resource.get("file")] = name
+            nodes.append((name, resource_type, resource))
+    for name, _, resource in nodes:
+        for reference in resource.get("references", []):
+            targets = placed.get(reference, {})
+            target = targets.get(resource.get("file")) or (next(iter(targets.values())) if len(targets) == 1 else None)
+            if target is not None and target != name:
+                diagram.setdefault("Links", []).append({
+                    "Source": name, "SourcePosition": "S",
+                    "Target": target, "TargetPosition": "N",
+                    "TargetArrowHead": {"Type": "Open"},
+                })
+    return {resource_type.rsplit("::", 1)[0] for _, resource_type, _ in nodes}
+
+
+def build_aws_architecture(customerA_services, customerB_services) -> dict:
+    # Either discovery_model.Discovery results or services_discovered dicts
+    from discovery_model import AwsService, as_discovery
+    architecture_content_dict = {
+        "Diagram": {
+            "DefinitionFiles":[{
+                "Type": "URL",
+                "Url": "https://raw.githubusercontent.com/awslabs/diagram-as-code/main/definitions/definition-for-aws-icons-light.yaml"
+            }],
+            "Resources": {
+            "Canvas": {
+                "Type": "AWS::Diagram::Canvas",
+                "Direction": "Vertical",
+                "Preset" : "AWSCloudNoLogo",
+                "Children": [
+                    "AWSCloud"
+                ]
+            }
+    }}}
+
+    # One cloud holds both customers' VPCs and cloud-level resources
+    aws_cloud = {"Type":"AWS::Diagram::Cloud", "Children": []}
+    architecture_content_dict["Diagram"]["Resources"]["AWSCloud"] = aws_cloud
+    for customer, _services_discovered in {"CustomerA": customerA_services, "CustomerB": customerB_services}.items():
+        _services_discovered = as_discovery(_services_discovered)
+        vpc = {
+            "Type": "AWS::VPC",
+            "Children": []
+        }
+        aws_cloud["Children"].append(customer)
+        architecture_content_dict["Diagram"]["Resources"][customer] = vpc
+        # Declared resources are placed as themselves; the generic nodes below stand for services
+        # that are used without being declared. Every node is named after its customer, as both
+        # customers share the cloud
+        declared = place_declared_resources(architecture_content_dict["Diagram"], customer, aws_cloud, vpc,
+                                            _services_discovered.infrastructure)
+        if _services_discovered.static_content and "AWS::CloudFront" not in declared:
+            cloud_front = {
+                "Type": "AWS::CloudFront"
+            }
+            architecture_content_dict["Diagram"]["Resources"][f"{customer}_AWSCloudFront"] = cloud_front
+            aws_cloud["Children"].append(f"{customer}_AWSCloudFront")
+
+        if _services_discovered.has_docker:
+            ec2 = {
+                "Type" : "AWS::EC2::Instance"
+            }
+            architecture_content_dict["Diagram"]["Resources"][f"{customer}_EC2_1"] = ec2
+            vpc["Children"].append(f"{customer}_EC2_1")
+
+        if AwsService.SQS in _services_discovered.aws_services and "AWS::SQS" not in declared:
+            sqs = {
+                "Type": "AWS::SQS"
+            }
+            architecture_content_dict["Diagram"]["Resources"][f"{customer}_SQS"] = sqs
+            aws_cloud["Children"].append(f"{customer}_SQS")
+
+
+        if AwsService.SNS in _services_discovered.aws_services and "AWS::SNS" not in declared:
+            sns = {
+                "Type": "AWS::SNS"
+            }
+            architecture_content_dict["Diagram"]["Resources"][f"{customer}_SNS"] = sns
+            aws_cloud["Children"].append(f"{customer}_SNS")
+
+        if AwsService.S3 in _services_discovered.aws_services and "AWS::S3" not in declared:
+            s3 = {
+                "Type": "AWS::S3"
+            }
+            architecture_content_dict["Diagram"]["Resources"][f"{customer}_S3"] = s3
+            aws_cloud["Children"].append(f"{customer}_S3")
+
+    #print(architecture_content_dict)
+    return architecture_content_dict
+    #return json.dumps(architecture_content_dict)
+
+
+def discover_services(customer, repo, fast=True, mirror_cache=None, result_cache=None):
+    import git.exc
+    if mirror_cache is not None:
+        with contextlib.ExitStack() as stack:
+            try:
+                mirror = stack.enter_context(mirror_cache.mirror(repo))
+            except git.exc.GitError as ge:
+                print(f"Git repo does not exist {repo}")
+                raise Exception(f"Git repo does not exist {repo}")
+            return Githubdisovery(result_cache).discover_services_in_git_tree(mirror)
+
+    workdir = make_workdir(customer)
+    try:
+        repo_directory = os.path.join(workdir, "repo")
+        try:
+            clone_repo(repo, repo_directory, fast=fast)
+        except git.exc.GitError as ge:
+            print(f"Git repo does not exist {repo}")
+            raise Exception(f"Git repo does not exist {repo}")
+
+        discovered_services = Githubdisovery(result_cache).discover_services_in_repo(repo_directory)
+        return discovered_services
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# A directory of its own per clone, so concurrent discoveries of the same customer never collide
+def make_workdir(customer):
+    os.makedirs(WORKDIR_ROOT, exist_ok=True)
+    return tempfile.mkdtemp(prefix=f"{customer}-", dir=WORKDIR_ROOT)
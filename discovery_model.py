@@ -0,0 +1,235 @@
+"""Typed, immutable form of a services_discovered dict.
+
+Parsers keep filling the free-form dict; consumers convert it once with as_discovery() and read
+attributes instead of probing nested dicts. Lists become frozensets, so duplicates are dropped,
+enabled AWS services become one AwsService bit field, and results hash and compare by value.
+"""
+import enum
+from dataclasses import dataclass
+
+from discovery import Services, load_balancer_servers
+
+
+class AwsService(enum.IntFlag):
+    SQS = enum.auto()
+    SNS = enum.auto()
+    RDS = enum.auto()
+    S3 = enum.auto()
+    LAMBDA = enum.auto()
+    CLOUDTRAIL = enum.auto()
+
+
+# services_discovered keys set to "enabled" for each AwsService
+AWS_SERVICE_KEYS = {
+    Services.AWS_SQS: AwsService.SQS,
+    Services.AWS_SNS: AwsService.SNS,
+    Services.AWS_RDS: AwsService.RDS,
+    Services.AWS_S3: AwsService.S3,
+    Services.AWS_LAMBDA: AwsService.LAMBDA,
+    Services.AWS_CLOUDTRAIL: AwsService.CLOUDTRAIL,
+}
+
+# Keys with a field of their own; anything else a parser reports is kept in Discovery.extra
+MODELLED_KEYS = {Services.DATABASE, Services.CACHE, Services.MQ, Services.APP_SERVER, Services.DOCKER,
+                 Services.LOAD_BALANCER, Services.STATIC_CONTENT, Services.WEB_SERVER, *AWS_SERVICE_KEYS}
+
+
+# Results of many repos repeat the same few sets of names; one shared instance each keeps them small.
+# frozenset() is not a singleton, so even the empty set is shared from here.
+EMPTY = frozenset()
+_interned = {EMPTY: EMPTY}
+
+
+def _intern(value):
+    if len(_interned) > 65536:
+        _interned.clear()
+    return _interned.setdefault(value, value)
+
+
+def _names(value):
+    if value is None:
+        return EMPTY
+    return _intern(frozenset([value] if isinstance(value, str) else value))
+
+
+def _freeze(value):
+    # Hashable form of an arbitrary JSON value; lists keep set semantics like the modelled fields
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    return value
+
+
+def _merge_frozen(old, new):
+    # Frozen counterpart of discovery.merge_services: sets union, dicts merge key by key
+    if isinstance(old, frozenset) and isinstance(new, frozenset):
+        return old | new
+    if isinstance(old, tuple) and isinstance(new, tuple):
+        merged = dict(old)
+        for key, value in new:
+            merged[key] = _merge_frozen(merged[key], value) if key in merged else value
+        return tuple(sorted(merged.items()))
+    return new
+
+
+def _thaw(value):
+    if isinstance(value, tuple):
+        return {key: _thaw(item) for key, item in value}
+    if isinstance(value, frozenset):
+        return sorted((_thaw(item) for item in value), key=repr)
+    return value
+
+
+@dataclass(frozen=True, slots=True)
+class Discovery:
+    aws_services: AwsService = AwsService(0)
+    databases: frozenset = EMPTY
+    caches: frozenset = EMPTY
+    message_queues: frozenset = EMPTY
+    app_server: str | None = None
+    docker_app_servers: frozenset = EMPTY
+    docker_message_queues: frozenset = EMPTY
+    # (key, frozen value) pairs of the rest of the docker entry: base_images, compose services
+    docker_extra: tuple = ()
+    # None without a load balancer; in the order discovery.load_balancer_servers gives them
+    lb_servers: tuple | None = None
+    # (key, frozen value) pairs of the rest of the lb entry: upstreams, proxy_pass
+    lb_extra: tuple = ()
+    static_content: bool = False
+    web_server: bool = False
+    # (key, frozen value) pairs, sorted by key, of whatever else was discovered
+    extra: tuple = ()
+
+    @classmethod
+    def from_dict(cls, services_discovered):
+        # Plain int arithmetic, IntFlag operators are comparatively slow
+        aws_services = 0
+        for key, flag in AWS_SERVICE_KEYS.items():
+            if services_discovered.get(key) == "enabled":
+                aws_services |= flag.value
+        docker = services_discovered.get(Services.DOCKER) or {}
+        lb = services_discovered.get(Services.LOAD_BALANCER)
+        return cls(
+            aws_services=AwsService(aws_services),
+            databases=_names(services_discovered.get(Services.DATABASE)),
+            caches=_names(services_discovered.get(Services.CACHE)),
+            message_queues=_names(services_discovered.get(Services.MQ)),
+            app_server=services_discovered.get(Services.APP_SERVER),
+            docker_app_servers=_names(docker.get(Services.APP_SERVER)),
+            docker_message_queues=_names(docker.get(Services.MQ)),
+            docker_extra=tuple(sorted((key, _freeze(value)) for key, value in docker.items()
+                                      if key not in (Services.APP_SERVER, Services.MQ))),
+            lb_servers=_intern(tuple(servers)) if (servers := load_balancer_servers(lb)) is not None else None,
+            lb_extra=tuple(sorted((key, _freeze(value)) for key, value in (lb or {}).items()
+                                  if key not in ("servers", "servers_count"))),
+            static_content=services_discovered.get(Services.STATIC_CONTENT) == "enabled",
+            web_server=services_discovered.get(Services.WEB_SERVER) == "enabled",
+            extra=tuple(sorted((key, _freeze(value)) for key, value in services_discovered.items()
+                               if key not in MODELLED_KEYS)),
+        )
+
+    def to_dict(self):
+        """The services_discovered dict shape, with sorted lists in place of sets."""
+        services_discovered = {key: _thaw(value) for key, value in self.extra}
+        for key, names in ((Services.DATABASE, self.databases), (Services.CACHE, self.caches),
+                           (Services.MQ, self.message_queues)):
+            if names:
+                services_discovered[key] = sorted(names)
+        if self.app_server is not None:
+            services_discovered[Services.APP_SERVER] = self.app_server
+        docker = {key: _thaw(value) for key, value in self.docker_extra}
+        docker.update((key, sorted(names)) for key, names in ((Services.APP_SERVER, self.docker_app_servers),
+                                                              (Services.MQ, self.docker_message_queues)) if names)
+        if docker:
+            services_discovered[Services.DOCKER] = docker
+        if self.lb_servers is not None:
+            services_discovered[Services.LOAD_BALANCER] = {key: _thaw(value) for key, value in self.lb_extra}
+            services_discovered[Services.LOAD_BALANCER].update(servers_count=len(self.lb_servers),
+                                                               servers=list(self.lb_servers))
+        for key, flag in AWS_SERVICE_KEYS.items():
+            if flag in self.aws_services:
+                services_discovered[key] = "enabled"
+        if self.static_content:
+            services_discovered[Services.STATIC_CONTENT] = "enabled"
+        if self.web_server:
+            services_discovered[Services.WEB_SERVER] = "enabled"
+        return services_discovered
+
+    def merge(self, other):
+        """Both results combined: sets and flags are unioned, dicts merged, other's single values win where set.
+
+        Load balancer servers are derived from the merged upstreams, or concatenated for results without any.
+        """
+        return Discovery.merge_all((self, other))
+
+    __or__ = merge
+
+    @staticmethod
+    def merge_all(discoveries):
+        """All results combined in order, as merge would, but building a single Discovery."""
+        aws_services = 0
+        databases, caches, message_queues = set(), set(), set()
+        docker_app_servers, docker_message_queues = set(), set()
+        single = {"app_server": None}
+        lb_servers = None
+        static_content = web_server = False
+        docker_extra = {}
+        lb_extra = {}
+        extra = {}
+        for discovery in discoveries:
+            aws_services |= discovery.aws_services.value
+            databases |= discovery.databases
+            caches |= discovery.caches
+            message_queues |= discovery.message_queues
+            docker_app_servers |= discovery.docker_app_servers
+            docker_message_queues |= discovery.docker_message_queues
+            for field in single:
+                if (value := getattr(discovery, field)) is not None:
+                    single[field] = value
+            if discovery.lb_servers is not None:
+                if lb_servers is None:
+                    lb_servers = []
+                lb_servers.extend(discovery.lb_servers)
+            static_content = static_content or discovery.static_content
+            web_server = web_server or discovery.web_server
+            for merged, pairs in ((docker_extra, discovery.docker_extra), (lb_extra, discovery.lb_extra),
+                                  (extra, discovery.extra)):
+                for key, value in pairs:
+                    merged[key] = _merge_frozen(merged[key], value) if key in merged else value
+        if lb_extra.get("upstreams") or lb_extra.get("proxy_pass"):
+            lb_servers = load_balancer_servers({key: _thaw(value) for key, value in lb_extra.items()})
+        return Discovery(
+            aws_services=AwsService(aws_services),
+            databases=_intern(frozenset(databases)),
+            caches=_intern(frozenset(caches)),
+            message_queues=_intern(frozenset(message_queues)),
+            docker_app_servers=_intern(frozenset(docker_app_servers)),
+            docker_message_queues=_intern(frozenset(docker_message_queues)),
+            lb_servers=_intern(tuple(lb_servers)) if lb_servers is not None else None,
+            static_content=static_content,
+            web_server=web_server,
+            docker_extra=tuple(sorted(docker_extra.items())),
+            lb_extra=tuple(sorted(lb_extra.items())),
+            extra=tuple(sorted(extra.items())),
+            **single,
+        )
+
+    @property
+    def has_docker(self):
+        return bool(self.docker_app_servers or self.docker_message_queues or self.docker_extra)
+
+    @property
+    def infrastructure(self):
+        """{address: [resource]} of the resources declared as infrastructure as code, one per declaring file."""
+        return _thaw(dict(self.extra).get(Services.INFRASTRUCTURE, ()))
+
+    @property
+    def any_app_server(self):
+        # One label for the diagrams; a repo's Dockerfiles may run several app servers
+        return self.app_server or ", ".join(sorted(self.docker_app_servers)) or None
+
+
+def as_discovery(discovery):
+    """A Discovery for either a Discovery or a services_discovered dict."""
+    return discovery if isinstance(discovery, Discovery) else Discovery.from_dict(discovery)
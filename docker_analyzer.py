@@ -0,0 +1,156 @@
+"""Dockerfile and docker-compose analysis.
+
+instructions() tokenizes a Dockerfile the way the builder reads it: parser directives, comments,
+line continuations (with the escape character the file declares) and JSON exec form arguments.
+analyze_dockerfile() streams through the instructions once and reports the external base images
+and the command the final stage runs. analyze_compose() reports every compose service with its
+image and the services it depends on. Neither knows about discovery; discovery.py maps the
+images and commands they report to services.
+"""
+import io
+import json
+import re
+
+# "# escape=`" and "# syntax=..." directives, only valid before the first instruction or comment
+DIRECTIVE_PATTERN = re.compile(r"#\s*([a-zA-Z]+)\s*=\s*(\S+)\s*$")
+
+
+def instructions(lines):
+    """(INSTRUCTION, arguments) pairs of a Dockerfile given as an iterable of lines.
+
+    Continued lines are joined, comment and blank lines inside a continuation are dropped as the
+    builder does, and instructions are upper-cased.
+    """
+    escape = "\\"
+    directives = True
+    parts = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        stripped = line.strip()
+        if directives:
+            if (match := DIRECTIVE_PATTERN.match(stripped)) is not None:
+                if match.group(1).lower() == "escape" and match.group(2) in ("\\", "`"):
+                    escape = match.group(2)
+                continue
+            directives = False
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped.endswith(escape):
+            parts.append(stripped[:-1])
+            continue
+        parts.append(stripped)
+        instruction, _, arguments = " ".join(parts).strip().partition(" ")
+        parts = []
+        yield instruction.upper(), arguments.strip()
+    if parts:
+        instruction, _, arguments = " ".join(parts).strip().partition(" ")
+        yield instruction.upper(), arguments.strip()
+
+
+def command_arguments(arguments):
+    """Arguments of a RUN/CMD/ENTRYPOINT as a list for exec form, or the shell form string."""
+    if arguments.startswith("["):
+        try:
+            exec_form = json.loads(arguments)
+        except ValueError:
+            return arguments
+        if isinstance(exec_form, list) and all(isinstance(argument, str) for argument in exec_form):
+            return exec_form
+    return arguments
+
+
+def command_line(command):
+    # Exec and shell form as one string, for keyword matching
+    if command is None:
+        return ""
+    return command if isinstance(command, str) else " ".join(command)
+
+
+def image_name(image):
+    """Repository name of an image reference without registry, tag or digest: "library/redis:7" -> "redis"."""
+    image = image.split("@", 1)[0]
+    name = image.rsplit("/", 1)[-1]
+    return name.split(":", 1)[0].lower()
+
+
+def analyze_dockerfile(lines):
+    """Base images and final command of a Dockerfile given as text or an iterable of lines.
+
+    Returns {"base_images": [...], "final_image": ..., "entrypoint": ..., "cmd": ...}. base_images
+    lists the external images stages are built FROM, in order; final_image is the external image
+    the last stage derives from. ENTRYPOINT and CMD are those the last stage runs, inherited
+    through FROM <stage> like the builder does, each a list (exec form) or a string (shell form).
+    """
+    if isinstance(lines, str):
+        lines = io.StringIO(lines)
+    base_images = []
+    # Stage name -> {"image": external base image, "entrypoint": ..., "cmd": ...} as the stage ends
+    stages = {}
+    current = None
+    for instruction, arguments in instructions(lines):
+        if instruction == "FROM":
+            words = [word for word in arguments.split() if not word.startswith("--")]
+            if not words:
+                continue
+            image = words[0]
+            if image.lower() in stages:
+                current = dict(stages[image.lower()])
+            else:
+                if image.lower() != "scratch" and image not in base_images:
+                    base_images.append(image)
+                current = {"image": image, "entrypoint": None, "cmd": None}
+            if len(words) >= 3 and words[1].lower() == "as":
+                stages[words[2].lower()] = current
+        elif current is None:
+            continue
+        elif instruction == "ENTRYPOINT":
+            # Setting ENTRYPOINT resets a CMD inherited from the base
+            current["entrypoint"] = command_arguments(arguments)
+            current["cmd"] = None
+        elif instruction == "CMD":
+            current["cmd"] = command_arguments(arguments)
+    return {
+        "base_images": base_images,
+        "final_image": current["image"] if current else None,
+        "entrypoint": current["entrypoint"] if current else None,
+        "cmd": current["cmd"] if current else None,
+    }
+
+
+def _service_names(value):
+    # depends_on and links: a list of names, "name:alias" links, or a mapping of name -> condition
+    if isinstance(value, dict):
+        return [str(name) for name in value]
+    if isinstance(value, list):
+        return [str(name).split(":", 1)[0] for name in value]
+    return []
+
+
+def analyze_compose(file_content):
+    """{service name: {"depends_on": [...], "image": ..., "build": True}} of a compose file.
+
+    image and build are only present when the service sets them, so merging an override file
+    that doesn't mention them keeps those of the base file. Returns None when the file is not
+    valid YAML or has no services mapping.
+    """
+    import yaml
+    try:
+        document = yaml.safe_load(file_content)
+    except yaml.YAMLError:
+        return None
+    services = document.get("services") if isinstance(document, dict) else None
+    if not isinstance(services, dict):
+        return None
+    analyzed = {}
+    for name, service in services.items():
+        service = service if isinstance(service, dict) else {}
+        depends_on = []
+        for dependency in _service_names(service.get("depends_on")) + _service_names(service.get("links")):
+            if dependency not in depends_on:
+                depends_on.append(dependency)
+        analyzed[str(name)] = {"depends_on": depends_on}
+        if service.get("image") is not None:
+            analyzed[str(name)]["image"] = str(service["image"])
+        if "build" in service:
+            analyzed[str(name)]["build"] = True
+    return analyzed
@@ -0,0 +1,243 @@
+"""Architecture diagrams straight from discovery results, without the diagrams object graph.
+
+architecture_topology() mirrors what aws_dac_generator.diagram_source draws, node for node and
+edge for edge. architecture_dot() writes it as DOT source with the same styling, for graphviz to
+lay out; architecture_svg() lays the small left-to-right topology out itself and needs no graphviz.
+All of them take a discovery_model.Discovery or a services_discovered dict.
+"""
+import base64
+import functools
+import html
+import importlib.util
+import os
+
+from discovery_model import AwsService, as_discovery
+
+# Icons shipped with the diagrams package, relative to its resources directory
+ICONS = {
+    "client": "onprem/client/client.png",
+    "cdn": "aws/network/cloudfront.png",
+    "elb": "aws/network/elastic-load-balancing.png",
+    "ec2": "aws/compute/ec2.png",
+    "ec2_instances": "aws/compute/ec2-instances.png",
+    "server": "onprem/compute/server.png",
+    "database": "aws/database/database.png",
+    "redis": "aws/database/elasticache-for-redis.png",
+    "memcached": "aws/database/elasticache-for-memcached.png",
+    "sqs": "aws/integration/simple-queue-service-sqs.png",
+    "sns": "aws/integration/simple-notification-service-sns.png",
+    "s3": "aws/storage/simple-storage-service-s3.png",
+    "lambda": "aws/compute/lambda.png",
+    "cloudtrail": "aws/management/cloudtrail.png",
+}
+
+# Styling diagrams.Diagram and diagrams.Cluster apply, so graphviz output looks the same
+FONT = "Sans-Serif"
+FONT_COLOR = "#2D3436"
+EDGE_COLOR = "#7B8894"
+CLUSTER_COLORS = ["#E5F5FD", "#EBF3E7"]
+CLUSTER_PEN_COLOR = "#AEB6BE"
+
+# Precomputed SVG layout, in pixels
+COLUMN_WIDTH = 180
+ROW_HEIGHT = 150
+ICON_SIZE = 96
+MARGIN = 60
+CLUSTER_PADDING = 24
+
+
+class Topology:
+    def __init__(self, title):
+        self.title = title
+        # (node id, label, icon, cluster path) in creation order; the cluster path is a tuple of cluster labels
+        self.nodes = []
+        self.edges = []
+
+    def node(self, label, icon, cluster=()):
+        node_id = f"n{len(self.nodes)}"
+        self.nodes.append((node_id, label, icon, cluster))
+        return node_id
+
+    def edge(self, source, target):
+        self.edges.append((source, target))
+
+
+def architecture_topology(customer, discovery):
+    """Nodes and edges of one customer's architecture, following aws_dac_generator.diagram_source."""
+    discovery = as_discovery(discovery)
+    topology = Topology(f"AWS Architecture - {customer}")
+    aws, ec2_cluster = ("AWS",), ("AWS", "EC2 instance")
+    client = topology.node("Client", "client")
+    cdn = elb = None
+    app_server = discovery.any_app_server
+    if discovery.static_content:
+        cdn = topology.node("Content Delivery", "cdn", aws)
+    if discovery.lb_servers is not None:
+        elb = topology.node("Application LB", "elb", aws)
+        if cdn:
+            topology.edge(cdn, elb)
+        ec2_object = topology.node(f"EC2 {" ".join(discovery.lb_servers)}", "ec2_instances", ec2_cluster)
+        if app_server:
+            topology.node(app_server, "server", ec2_cluster)
+        if cdn:
+            topology.node("Webserver", "server", ec2_cluster)
+        topology.edge(elb, ec2_object)
+    else:
+        ec2_object = topology.node("EC2", "ec2", aws)
+        if app_server:
+            topology.node(app_server, "server", aws)
+        if cdn:
+            topology.node("WebServer", "server", aws)
+        topology.edge(cdn or client, ec2_object)
+
+    ec2_links = [topology.node(db, "database") for db in sorted(discovery.databases)]
+    if discovery.caches:
+        # Like the diagrams renderer: every cache gets a node, only the last one an edge
+        for cache in sorted(discovery.caches):
+            cache_node = topology.node(*(("Redis", "redis") if cache == 'redis' else ("Other Cache", "memcached")))
+        for flag, label, icon in ((AwsService.SQS, "SQS Messaging", "sqs"),
+                                  (AwsService.SNS, "SNS messaging", "sns"),
+                                  (AwsService.S3, "S3", "s3"),
+                                  (AwsService.LAMBDA, "Lambda", "lambda"),
+                                  (AwsService.CLOUDTRAIL, "Cloudtrail", "cloudtrail")):
+            if flag in discovery.aws_services:
+                ec2_links.append(topology.node(label, icon))
+        ec2_links.append(cache_node)
+    for link in ec2_links:
+        topology.edge(ec2_object, link)
+    if cdn or elb:
+        topology.edge(client, cdn or elb)
+    return topology
+
+
+@functools.lru_cache(maxsize=1)
+def icon_directory():
+    # diagrams resolves icons next to its package; find_spec locates it without importing diagrams
+    spec = importlib.util.find_spec("diagrams")
+    return os.path.join(os.path.dirname(os.path.dirname(spec.origin)), "resources")
+
+
+def icon_path(icon):
+    return os.path.join(icon_directory(), ICONS[icon])
+
+
+@functools.lru_cache(maxsize=None)
+def icon_data_uri(icon):
+    with open(icon_path(icon), "rb") as file:
+        return "data:image/png;base64," + base64.b64encode(file.read()).decode("ascii")
+
+
+def _quote(value):
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def architecture_dot(customer, discovery):
+    """DOT source of one customer's architecture, styled like the diagrams renderer."""
+    topology = architecture_topology(customer, discovery)
+    lines = [
+        f"digraph {_quote(topology.title)} {{",
+        f'\tgraph [fontcolor="{FONT_COLOR}" fontname="{FONT}" fontsize=15 label={_quote(topology.title)} '
+        f'nodesep=0.60 pad=2.0 rankdir=LR ranksep=0.75 splines=ortho]',
+        f'\tnode [fixedsize=true fontcolor="{FONT_COLOR}" fontname="{FONT}" fontsize=13 height=1.4 '
+        f'imagescale=true labelloc=b shape=box style=rounded width=1.4]',
+        f'\tedge [color="{EDGE_COLOR}"]',
+    ]
+    clusters = {(): lines}
+    for node_id, label, icon, cluster in topology.nodes:
+        for depth in range(1, len(cluster) + 1):
+            if cluster[:depth] not in clusters:
+                indent = "\t" * (depth + 1)
+                clusters[cluster[:depth]] = [
+                    f"{indent[1:]}subgraph {_quote('cluster_' + cluster[depth - 1])} {{",
+                    f'{indent}graph [bgcolor="{CLUSTER_COLORS[(depth - 1) % len(CLUSTER_COLORS)]}" fontname="{FONT}" '
+                    f'fontsize=12 label={_quote(cluster[depth - 1])} labeljust=l pencolor="{CLUSTER_PEN_COLOR}" '
+                    f'rankdir=LR shape=box style=rounded]',
+                ]
+        indent = "\t" * (len(cluster) + 1)
+        clusters[cluster].append(f"{indent}{node_id} [label={_quote(label)} height=1.9 "
+                                 f"image={_quote(icon_path(icon))} shape=none]")
+    # Nest clusters innermost first, each closed inside its parent
+    for cluster in sorted((c for c in clusters if c), key=len, reverse=True):
+        clusters[cluster].append("\t" * len(cluster) + "}")
+        clusters[cluster[:-1]].extend(clusters[cluster])
+    for source, target in topology.edges:
+        lines.append(f'\t{source} -> {target} [dir=forward fontcolor="{FONT_COLOR}" fontname="{FONT}" fontsize=13]')
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _columns(topology):
+    """Column of every node: its longest path from the client; unlinked nodes join their cluster's column."""
+    columns = {topology.nodes[0][0]: 0}
+    changed = True
+    while changed:
+        changed = False
+        for source, target in topology.edges:
+            if source in columns and columns.get(target, -1) < columns[source] + 1:
+                columns[target] = columns[source] + 1
+                changed = True
+    last = max(columns.values())
+    for node_id, _, _, cluster in topology.nodes:
+        if node_id not in columns:
+            siblings = [columns[other] for other, _, _, c in topology.nodes if c == cluster and other in columns]
+            columns[node_id] = max(siblings) if siblings else max(last, 1)
+    return columns
+
+
+def architecture_svg(customer, discovery, embed_icons=True):
+    """Self-contained SVG of one customer's architecture with a precomputed left-to-right layout."""
+    topology = architecture_topology(customer, discovery)
+    columns = _columns(topology)
+    rows = {}
+    positions = {}
+    for node_id, _, _, _ in topology.nodes:
+        column = columns[node_id]
+        rows[column] = rows.get(column, 0) + 1
+        positions[node_id] = (column, rows[column] - 1)
+    height_rows = max(rows.values())
+    width = MARGIN * 2 + COLUMN_WIDTH * (max(rows) + 1)
+    height = MARGIN * 2 + ROW_HEIGHT * height_rows + 40
+
+    def center(node_id):
+        column, row = positions[node_id]
+        # Center each column vertically
+        offset = (height_rows - rows[column]) * ROW_HEIGHT / 2
+        return MARGIN + COLUMN_WIDTH * column + COLUMN_WIDTH / 2, MARGIN + offset + ROW_HEIGHT * row + ICON_SIZE / 2
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" width="{width}" '
+        f'height="{height}" viewBox="0 0 {width} {height}" font-family="{FONT}">',
+        '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="8" markerHeight="8" '
+        f'orient="auto"><path d="M0,0 L10,5 L0,10 z" fill="{EDGE_COLOR}"/></marker></defs>',
+        '<rect width="100%" height="100%" fill="white"/>',
+    ]
+    clusters = sorted({cluster[:depth] for _, _, _, cluster in topology.nodes for depth in range(1, len(cluster) + 1)},
+                      key=len)
+    for cluster in clusters:
+        members = [center(node_id) for node_id, _, _, c in topology.nodes if c[:len(cluster)] == cluster]
+        padding = CLUSTER_PADDING * (len(clusters) - len(cluster) + 1)
+        left = min(x for x, _ in members) - ICON_SIZE / 2 - padding
+        top = min(y for _, y in members) - ICON_SIZE / 2 - padding
+        right = max(x for x, _ in members) + ICON_SIZE / 2 + padding
+        bottom = max(y for _, y in members) + ICON_SIZE / 2 + 24 + padding
+        parts.append(f'<rect x="{left:.0f}" y="{top:.0f}" width="{right - left:.0f}" height="{bottom - top:.0f}" rx="8" '
+                     f'fill="{CLUSTER_COLORS[(len(cluster) - 1) % len(CLUSTER_COLORS)]}" stroke="{CLUSTER_PEN_COLOR}"/>')
+        parts.append(f'<text x="{left + 8:.0f}" y="{top + 16:.0f}" font-size="12" fill="{FONT_COLOR}">'
+                     f'{html.escape(cluster[-1])}</text>')
+    for source, target in topology.edges:
+        (x1, y1), (x2, y2) = center(source), center(target)
+        x1, x2 = x1 + ICON_SIZE / 2, x2 - ICON_SIZE / 2
+        middle = (x1 + x2) / 2
+        parts.append(f'<path d="M{x1:.0f},{y1:.0f} H{middle:.0f} V{y2:.0f} H{x2:.0f}" fill="none" '
+                     f'stroke="{EDGE_COLOR}" marker-end="url(#arrow)"/>')
+    for node_id, label, icon, _ in topology.nodes:
+        x, y = center(node_id)
+        href = icon_data_uri(icon) if embed_icons else icon_path(icon)
+        parts.append(f'<image x="{x - ICON_SIZE / 2:.0f}" y="{y - ICON_SIZE / 2:.0f}" width="{ICON_SIZE}" '
+                     f'height="{ICON_SIZE}" xlink:href="{href}"/>')
+        parts.append(f'<text x="{x:.0f}" y="{y + ICON_SIZE / 2 + 18:.0f}" font-size="13" text-anchor="middle" '
+                     f'fill="{FONT_COLOR}">{html.escape(label)}</text>')
+    parts.append(f'<text x="{width / 2:.0f}" y="{height - 20:.0f}" font-size="15" text-anchor="middle" '
+                 f'fill="{FONT_COLOR}">{html.escape(topology.title)}</text>')
+    parts.append("</svg>")
+    return "\n".join(parts) + "\n"
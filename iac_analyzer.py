@@ -0,0 +1,300 @@
+"""Resources declared as infrastructure as code: Terraform, CloudFormation (and CDK output) and Kubernetes.
+
+Every analyzer returns {address: resource}, where a resource is {"type": ..., "source": ...} with
+the addresses it references under "references" and, for Kubernetes workloads, the container
+images under "images". Addresses are those the source uses: aws_sqs_queue.orders for Terraform,
+the logical ID for CloudFormation and Kind/name for Kubernetes.
+
+Terraform is scanned line by line, tracking only block depth, strings, comments and heredocs.
+YAML is never materialised as a document tree: libyaml's parser events are walked as they come,
+keeping only the path to the current node. JSON templates are parsed with json.loads, which is
+several times faster than walking events in Python, and their values go through the same walk.
+"""
+import json
+import re
+
+SOURCE_TERRAFORM = "terraform"
+SOURCE_CLOUDFORMATION = "cloudformation"
+SOURCE_KUBERNETES = "kubernetes"
+
+# CloudFormation type of the Terraform AWS resources discovery and the architecture know about
+TERRAFORM_CLOUDFORMATION_TYPES = {
+    "aws_sqs_queue": "AWS::SQS::Queue",
+    "aws_sns_topic": "AWS::SNS::Topic",
+    "aws_sns_topic_subscription": "AWS::SNS::Subscription",
+    "aws_s3_bucket": "AWS::S3::Bucket",
+    "aws_db_instance": "AWS::RDS::DBInstance",
+    "aws_rds_cluster": "AWS::RDS::DBCluster",
+    "aws_dynamodb_table": "AWS::DynamoDB::Table",
+    "aws_elasticache_cluster": "AWS::ElastiCache::CacheCluster",
+    "aws_elasticache_replication_group": "AWS::ElastiCache::ReplicationGroup",
+    "aws_lambda_function": "AWS::Lambda::Function",
+    "aws_cloudtrail": "AWS::CloudTrail::Trail",
+    "aws_cloudfront_distribution": "AWS::CloudFront::Distribution",
+    "aws_instance": "AWS::EC2::Instance",
+    "aws_lb": "AWS::ElasticLoadBalancingV2::LoadBalancer",
+    "aws_alb": "AWS::ElasticLoadBalancingV2::LoadBalancer",
+    "aws_elb": "AWS::ElasticLoadBalancing::LoadBalancer",
+    "aws_ecs_service": "AWS::ECS::Service",
+    "aws_eks_cluster": "AWS::EKS::Cluster",
+    "aws_msk_cluster": "AWS::MSK::Cluster",
+    "aws_mq_broker": "AWS::AmazonMQ::Broker",
+    "aws_opensearch_domain": "AWS::OpenSearchService::Domain",
+    "aws_elasticsearch_domain": "AWS::Elasticsearch::Domain",
+    "aws_kinesis_stream": "AWS::Kinesis::Stream",
+    "aws_api_gateway_rest_api": "AWS::ApiGateway::RestApi",
+    "aws_apigatewayv2_api": "AWS::ApiGatewayV2::Api",
+}
+
+# Kubernetes kinds worth reporting; workloads also report their container images
+KUBERNETES_KINDS = {"Deployment", "StatefulSet", "DaemonSet", "Job", "CronJob", "Pod", "ReplicaSet", "Service",
+                    "Ingress"}
+
+# Content any of the analyzers can use; anything else is rejected before parsing
+PREFILTER_PATTERN = re.compile(rb"AWS::|AWSTemplateFormatVersion|apiVersion")
+
+TERRAFORM_RESOURCE = re.compile(r'^\s*resource\s+"([^"]+)"\s+"([^"]+)"')
+# A string, a comment, a brace or the start of a heredoc; anything else on a line is code
+TERRAFORM_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|#.*|//.*|/\*|[{}]|<<-?\s*"?([A-Za-z_]\w*)"?')
+# Lines without any of these characters can't change the block structure
+TERRAFORM_STRUCTURE_CHARS = re.compile(r"[{}#/<]")
+TERRAFORM_REFERENCE = re.compile(r"\b([a-z][a-z0-9]*_[a-z0-9_]+)\.([A-Za-z_][\w-]*)")
+SUBSTITUTION = re.compile(r"\$\{([A-Za-z0-9]+)(?:\.[^}]*)?\}")
+
+# Value of the events for mappings and sequences, which no scalar can be equal to
+COLLECTION_START = object()
+
+
+def cloudformation_type(resource_type):
+    """CloudFormation type of a CloudFormation or known Terraform resource type, else None."""
+    if "::" in resource_type:
+        return resource_type
+    return TERRAFORM_CLOUDFORMATION_TYPES.get(resource_type)
+
+
+def is_manifest(file_content):
+    """Whether bytes may hold a CloudFormation template or Kubernetes manifest, without parsing them."""
+    return PREFILTER_PATTERN.search(file_content) is not None
+
+
+def analyze_terraform(lines):
+    """Resources a .tf file declares, given as text or an iterable of lines."""
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    resources = {}
+    depth = 0
+    current = None
+    in_comment = False
+    heredoc = None
+    for line in lines:
+        if heredoc is not None:
+            if line.strip() == heredoc:
+                heredoc = None
+            elif current is not None:
+                _add_terraform_references(current, line)
+            continue
+        if in_comment:
+            if "*/" not in line:
+                continue
+            line = line[line.index("*/") + 2:]
+            in_comment = False
+        if depth == 0 and (match := TERRAFORM_RESOURCE.match(line)):
+            address = f"{match.group(1)}.{match.group(2)}"
+            current = resources[address] = {"type": match.group(1), "source": SOURCE_TERRAFORM}
+        code = line
+        closed = False
+        for token in TERRAFORM_TOKEN.finditer(line) if TERRAFORM_STRUCTURE_CHARS.search(line) else ():
+            text = token.group()
+            if text == "{":
+                depth += 1
+            elif text == "}":
+                depth -= 1
+                closed = depth == 0
+            elif text == "/*":
+                code = line[:token.start()]
+                if "*/" not in line[token.end():]:
+                    in_comment = True
+                break
+            elif text[0] in "#/":
+                code = line[:token.start()]
+                break
+            elif token.group(1) is not None:
+                heredoc = token.group(1)
+        if current is not None:
+            _add_terraform_references(current, code)
+            if closed:
+                current = None
+    return resources
+
+
+def _add_terraform_references(resource, code):
+    for match in TERRAFORM_REFERENCE.finditer(code):
+        address = f"{match.group(1)}.{match.group(2)}"
+        references = resource.setdefault("references", [])
+        if address not in references:
+            references.append(address)
+
+
+def _yaml_loader():
+    import yaml
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def yaml_events(file_content):
+    """(path, tag, value) of every scalar, and (path, tag, COLLECTION_START) of every collection, of a YAML stream.
+
+    path is the tuple of mapping keys and sequence indices leading to the node; every document
+    starts with (None, None, None).
+    """
+    import yaml
+    if not isinstance(file_content, (bytes, str)):
+        # A memory-mapped file is read by the parser in chunks, like any other stream
+        file_content.seek(0)
+    scalar, alias, mapping_start, sequence_start = (yaml.ScalarEvent, yaml.AliasEvent, yaml.MappingStartEvent,
+                                                    yaml.SequenceStartEvent)
+    collection_end = (yaml.MappingEndEvent, yaml.SequenceEndEvent)
+    path = []
+    # One [is a mapping expecting its next key, is a mapping, is itself a complex key] per open collection
+    stack = []
+    for event in yaml.parse(file_content, Loader=_yaml_loader()):
+        kind = event.__class__
+        if kind is scalar or kind is alias:
+            if stack and stack[-1][0]:
+                path[-1] = getattr(event, "value", None)
+                stack[-1][0] = False
+                continue
+            yield tuple(path), getattr(event, "tag", None), getattr(event, "value", None)
+        elif kind is mapping_start or kind is sequence_start:
+            is_key = bool(stack) and stack[-1][0]
+            if is_key:
+                # A complex key, which none of the formats read here use
+                path[-1] = None
+                stack[-1][0] = False
+            else:
+                yield tuple(path), event.tag, COLLECTION_START
+            stack.append([kind is mapping_start, kind is mapping_start, is_key])
+            path.append(None if kind is mapping_start else 0)
+            continue
+        elif kind in collection_end:
+            path.pop()
+            if stack.pop()[2]:
+                continue
+        elif kind is yaml.DocumentStartEvent:
+            path, stack = [], []
+            yield None, None, None
+            continue
+        else:
+            continue
+        # After a value a mapping expects its next key and a sequence moves to its next item
+        if stack:
+            if stack[-1][1]:
+                stack[-1][0] = True
+            else:
+                path[-1] += 1
+
+
+def json_events(value, path=()):
+    """yaml_events for an already parsed JSON document."""
+    if not path:
+        yield None, None, None
+    if isinstance(value, dict):
+        yield path, None, COLLECTION_START
+        for key, item in value.items():
+            yield from json_events(item, path + (key,))
+    elif isinstance(value, list):
+        yield path, None, COLLECTION_START
+        for index, item in enumerate(value):
+            yield from json_events(item, path + (index,))
+    else:
+        yield path, None, value if value is None or isinstance(value, str) else str(value)
+
+
+class _ManifestAnalyzer:
+    """Collects CloudFormation resources and Kubernetes objects from (path, tag, value) events."""
+
+    def __init__(self):
+        self.resources = {}
+        self.document = None
+
+    def feed(self, events):
+        for path, tag, value in events:
+            if path is None:
+                self.finish_document()
+                self.document = {"kind": None, "name": None, "apiVersion": None, "images": [],
+                                 "cloudformation": {}, "references": {}, "get_att": set()}
+            else:
+                self.event(path, tag, value)
+        self.finish_document()
+        return self.resources
+
+    def event(self, path, tag, value):
+        document = self.document
+        if value is COLLECTION_START:
+            if tag == "!GetAtt":
+                # The sequence form, !GetAtt [LogicalId, Attribute]
+                document["get_att"].add(path)
+            return
+        if len(path) == 1 and path[0] in ("kind", "apiVersion"):
+            document[path[0]] = value
+        elif path == ("metadata", "name"):
+            document["name"] = value
+        elif path and path[-1] == "image" and isinstance(value, str):
+            document["images"].append(value)
+        if len(path) > 2 and path[0] == "Resources" and isinstance(path[1], str) and isinstance(value, str):
+            if len(path) == 3 and path[2] == "Type":
+                document["cloudformation"][path[1]] = value
+            else:
+                references = document["references"].setdefault(path[1], [])
+                for reference in self.cloudformation_references(document, path, tag, value):
+                    if reference not in references:
+                        references.append(reference)
+
+    @staticmethod
+    def cloudformation_references(document, path, tag, value):
+        """Logical IDs a scalar inside a resource refers to through Ref, Fn::GetAtt, Fn::Sub or DependsOn."""
+        if tag in ("!Ref", "!GetAtt") or path[-1] in ("Ref", "Fn::GetAtt"):
+            return [value.split(".", 1)[0]]
+        if path[-1] == "DependsOn" or path[-2] == "DependsOn":
+            return [value]
+        if path[-1] == 0 and (path[-2] == "Fn::GetAtt" or path[:-1] in document["get_att"]):
+            return [value]
+        if tag == "!Sub" or "Fn::Sub" in path:
+            return SUBSTITUTION.findall(value)
+        return []
+
+    def finish_document(self):
+        document = self.document
+        if document is None:
+            return
+        for logical_id, resource_type in document["cloudformation"].items():
+            resource = {"type": resource_type, "source": SOURCE_CLOUDFORMATION}
+            references = [reference for reference in document["references"].get(logical_id, [])
+                          if reference in document["cloudformation"] and reference != logical_id]
+            if references:
+                resource["references"] = references
+            self.resources[logical_id] = resource
+        if document["apiVersion"] and document["kind"] in KUBERNETES_KINDS and document["name"]:
+            resource = {"type": document["kind"], "source": SOURCE_KUBERNETES}
+            if document["images"]:
+                resource["images"] = list(dict.fromkeys(document["images"]))
+            self.resources[f"{document['kind']}/{document['name']}"] = resource
+        self.document = None
+
+
+def analyze_yaml_manifest(file_content):
+    """CloudFormation resources and Kubernetes objects of a YAML (or JSON) stream; None if it doesn't parse."""
+    import yaml
+    analyzer = _ManifestAnalyzer()
+    try:
+        return analyzer.feed(yaml_events(file_content))
+    except yaml.YAMLError:
+        return None
+
+
+def analyze_json_manifest(file_content):
+    """CloudFormation resources or a Kubernetes object of a JSON template, such as cdk.out/*.template.json."""
+    try:
+        document = json.loads(file_content if isinstance(file_content, (bytes, str)) else bytes(file_content))
+    except ValueError:
+        return None
+    return _ManifestAnalyzer().feed(json_events(document))
@@ -0,0 +1,79 @@
+import json
+
+from git import Repo
+
+import repo_walk
+
+
+class DiscoverySnapshot:
+    """Discovery result of one commit, with the fragment each file contributed."""
+
+    def __init__(self, commit, file_fragments):
+        self.commit = commit
+        self.file_fragments = file_fragments
+
+    @property
+    def services_discovered(self):
+        from discovery import Githubdisovery
+        discovery = Githubdisovery()
+        for path in sorted(self.file_fragments):
+            discovery.merge_fragment(self.file_fragments[path])
+        return discovery.services_discovered
+
+    def contributors(self, service):
+        return sorted(path for path, fragment in self.file_fragments.items() if service in fragment)
+
+    def to_dict(self):
+        return {"commit": self.commit, "files": self.file_fragments}
+
+    @classmethod
+    def from_dict(cls, snapshot_dict):
+        return cls(snapshot_dict["commit"], snapshot_dict["files"])
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as file:
+            return cls.from_dict(json.load(file))
+
+
+def _blob_fragment(discovery, blob):
+    from discovery import read_blob, SYMLINK_MODE
+    if blob.mode == SYMLINK_MODE:
+        return {}
+    return discovery.file_fragment(blob.name, lambda binary, max_bytes: read_blob(blob, binary, max_bytes),
+                                   lambda: blob.hexsha)
+
+
+def snapshot_discovery(repo_path, rev="HEAD", parse_cache=None):
+    from discovery import Githubdisovery
+    discovery = Githubdisovery(parse_cache)
+    commit = Repo(repo_path).commit(rev)
+    file_fragments = {}
+    # The same files discover_services_in_git_tree reads, so a snapshot matches a full walk
+    for item in commit.tree.traverse(predicate=lambda i, d: i.type == "blob",
+                                     prune=lambda i, d: i.type == "tree" and i.name in discovery.deny_dirs):
+        if fragment := _blob_fragment(discovery, item):
+            file_fragments[item.path] = fragment
+    return DiscoverySnapshot(commit.hexsha, file_fragments)
+
+
+def rediscover(repo_path, snapshot, rev="HEAD", parse_cache=None):
+    """Bring snapshot up to rev, re-parsing only the files changed since snapshot.commit."""
+    from discovery import Githubdisovery
+    discovery = Githubdisovery(parse_cache)
+    repo = Repo(repo_path)
+    commit = repo.commit(rev)
+    file_fragments = dict(snapshot.file_fragments)
+    for diff in repo.commit(snapshot.commit).diff(commit):
+        # Facts from the old side are retracted; deletes and renames have no new side
+        if diff.a_path:
+            file_fragments.pop(diff.a_path, None)
+        if (diff.b_blob is not None and not diff.deleted_file
+                and not repo_walk.in_denied_dir(diff.b_path, discovery.deny_dirs)):
+            if fragment := _blob_fragment(discovery, diff.b_blob):
+                file_fragments[diff.b_path] = fragment
+    return DiscoverySnapshot(commit.hexsha, file_fragments)
@@ -0,0 +1,252 @@
+"""Local asyncio job service that discovers services and renders diagrams off the UI thread.
+
+    python job_service.py --port 8765
+
+    POST /jobs                            {"customerA": URL, "customerB": URL} -> {"id", "status", "deduplicated"}
+    GET  /jobs/<id>                       status: queued, running, done or failed
+    GET  /jobs/<id>/result                discoveries and diagram links, 409 until the job is done
+    GET  /jobs/<id>/diagrams/<customer>   rendered PNG
+
+Every job renders into a directory of its own. A submit naming the same repositories at the same
+commits as a queued or running job gets that job back instead of starting another one.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.escape
+import tornado.web
+
+import parse_cache
+import render_cache
+import repo_cache
+
+DEFAULT_PORT = 8765
+DEFAULT_JOBS_DIR = "/tmp/discovery_jobs"
+DEFAULT_MAX_CONCURRENT_JOBS = 4
+# Finished jobs, and their diagrams, are dropped this long after they finish
+DEFAULT_RESULT_TTL = 3600
+
+CUSTOMERS = {"customerA": "CustomerA", "customerB": "CustomerB"}
+
+
+class JobError(Exception):
+    pass
+
+
+async def resolve_commit(url):
+    """The commit HEAD of a remote repository points at, via git ls-remote."""
+    process = await asyncio.create_subprocess_exec(
+        "git", "ls-remote", url, "HEAD",
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        env={**os.environ, "GIT_TERMINAL_PROMPT": "0"})
+    stdout, stderr = await process.communicate()
+    fields = stdout.decode("utf-8", "replace").split()
+    if process.returncode != 0 or not fields:
+        raise JobError(f"Git repo does not exist {url}")
+    return fields[0]
+
+
+class Job:
+    def __init__(self, repos, commits, directory):
+        self.id = uuid.uuid4().hex
+        self.repos = repos
+        self.commits = commits
+        self.directory = directory
+        self.status = "queued"
+        self.error = None
+        self.services_discovered = None
+        self.submitted = time.time()
+        self.finished = None
+
+    @property
+    def key(self):
+        return tuple(sorted((customer, url, self.commits[customer]) for customer, url in self.repos.items()))
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "repos": self.repos,
+            "commits": self.commits,
+            "submitted": self.submitted,
+            "finished": self.finished,
+        }
+
+
+class DiscoveryService:
+    """Runs discovery jobs on a thread pool, at most max_concurrent_jobs at a time."""
+
+    def __init__(self, jobs_dir=DEFAULT_JOBS_DIR, max_concurrent_jobs=DEFAULT_MAX_CONCURRENT_JOBS,
+                 result_ttl=DEFAULT_RESULT_TTL, mirror_cache=None, result_cache=None, diagram_cache=None):
+        os.makedirs(jobs_dir, exist_ok=True)
+        self.jobs_dir = jobs_dir
+        self.result_ttl = result_ttl
+        self.mirror_cache = mirror_cache if mirror_cache is not None else repo_cache.RepoMirrorCache()
+        self.result_cache = result_cache if result_cache is not None else parse_cache.ParseCache()
+        self.diagram_cache = diagram_cache if diagram_cache is not None else render_cache.RenderCache()
+        self.jobs = {}
+        self._in_flight = {}
+        self._mirror_locks = {}
+        # The event loop only keeps weak references to tasks
+        self._tasks = set()
+        self._slots = asyncio.Semaphore(max_concurrent_jobs)
+        self._executor = ThreadPoolExecutor(max_concurrent_jobs * len(CUSTOMERS))
+
+    async def submit(self, repos):
+        """Queue a job for {customer: url}; returns (job, deduplicated)."""
+        self.expire()
+        commits = dict(zip(repos, await asyncio.gather(*(resolve_commit(url) for url in repos.values()))))
+        job = Job(repos, commits, None)
+        if (existing := self._in_flight.get(job.key)) is not None:
+            return existing, True
+        job.directory = tempfile.mkdtemp(prefix=f"{job.id}-", dir=self.jobs_dir)
+        self.jobs[job.id] = job
+        self._in_flight[job.key] = job
+        task = asyncio.create_task(self.run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job, False
+
+    async def run(self, job):
+        try:
+            async with self._slots:
+                job.status = "running"
+                discoveries = await asyncio.gather(*(self.discover(url, job.commits[customer])
+                                                     for customer, url in job.repos.items()))
+                job.services_discovered = dict(zip(job.repos, discoveries))
+                await self.in_thread(self.render, job)
+                job.status = "done"
+        except Exception as ex:
+            job.status = "failed"
+            job.error = str(ex)
+        finally:
+            job.finished = time.time()
+            del self._in_flight[job.key]
+
+    async def discover(self, url, commit):
+        # One fetch at a time per mirror; jobs for different repositories run side by side
+        async with self._mirror_locks.setdefault(url, asyncio.Lock()):
+            return await self.in_thread(self.discover_commit, url, commit)
+
+    def discover_commit(self, url, commit):
+        import git.exc
+        from discovery import Githubdisovery
+        # The mirror is held while it is read, so another job's update can't evict it meanwhile
+        with contextlib.ExitStack() as stack:
+            try:
+                mirror = stack.enter_context(self.mirror_cache.mirror(url))
+            except git.exc.GitError:
+                raise JobError(f"Git repo does not exist {url}")
+            return Githubdisovery(self.result_cache).discover_services_in_git_tree(mirror, rev=commit)
+
+    def render(self, job):
+        import aws_dac_generator
+        aws_dac_generator.generate_architecture_diagram(
+            job.services_discovered["CustomerA"], job.services_discovered["CustomerB"], output_dir=job.directory,
+            render_cache=self.diagram_cache)
+
+    async def in_thread(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def diagram_path(self, job, customer):
+        return os.path.join(job.directory, f"{customer}.png")
+
+    def expire(self):
+        cutoff = time.time() - self.result_ttl
+        for job in list(self.jobs.values()):
+            if job.finished is not None and job.finished < cutoff:
+                del self.jobs[job.id]
+                shutil.rmtree(job.directory, ignore_errors=True)
+
+
+class ServiceHandler(tornado.web.RequestHandler):
+    def initialize(self, service):
+        self.service = service
+
+    def get_job(self, job_id):
+        job = self.service.jobs.get(job_id)
+        if job is None:
+            raise tornado.web.HTTPError(404, reason=f"Unknown job {job_id}")
+        return job
+
+
+class JobsHandler(ServiceHandler):
+    async def post(self):
+        try:
+            body = tornado.escape.json_decode(self.request.body)
+            repos = {customer: body[field].strip() for field, customer in CUSTOMERS.items()}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.set_status(400)
+            self.finish({"error": f"Expected a JSON object with {' and '.join(CUSTOMERS)} URLs"})
+            return
+        try:
+            job, deduplicated = await self.service.submit(repos)
+        except JobError as ex:
+            self.set_status(400)
+            self.finish({"error": str(ex)})
+            return
+        self.set_status(200 if deduplicated else 202)
+        self.finish({**job.to_dict(), "deduplicated": deduplicated})
+
+
+class JobHandler(ServiceHandler):
+    def get(self, job_id):
+        self.finish(self.get_job(job_id).to_dict())
+
+
+class ResultHandler(ServiceHandler):
+    def get(self, job_id):
+        job = self.get_job(job_id)
+        if job.status != "done":
+            self.set_status(409)
+            self.finish(job.to_dict())
+            return
+        self.finish({
+            **job.to_dict(),
+            "services_discovered": job.services_discovered,
+            "diagrams": {customer: self.reverse_url("diagram", job.id, customer) for customer in job.repos},
+        })
+
+
+class DiagramHandler(ServiceHandler):
+    async def get(self, job_id, customer):
+        job = self.get_job(job_id)
+        if job.status != "done" or customer not in job.repos:
+            raise tornado.web.HTTPError(404)
+        self.set_header("Content-Type", "image/png")
+        with open(self.service.diagram_path(job, customer), "rb") as diagram:
+            self.finish(diagram.read())
+
+
+def make_app(service):
+    arguments = {"service": service}
+    return tornado.web.Application([
+        tornado.web.url(r"/jobs", JobsHandler, arguments),
+        tornado.web.url(r"/jobs/(\w+)", JobHandler, arguments),
+        tornado.web.url(r"/jobs/(\w+)/result", ResultHandler, arguments),
+        tornado.web.url(r"/jobs/(\w+)/diagrams/(\w+)", DiagramHandler, arguments, name="diagram"),
+    ])
+
+
+async def serve(port, jobs_dir, max_concurrent_jobs):
+    app = make_app(DiscoveryService(jobs_dir, max_concurrent_jobs))
+    app.listen(port, address="127.0.0.1")
+    print(f"Discovery job service listening on http://127.0.0.1:{port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the discovery job service.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--jobs-dir", default=DEFAULT_JOBS_DIR)
+    parser.add_argument("--max-concurrent-jobs", type=int, default=DEFAULT_MAX_CONCURRENT_JOBS)
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.jobs_dir, args.max_concurrent_jobs))
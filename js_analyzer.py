@@ -0,0 +1,69 @@
+"""Import and SDK client scanner for JavaScript and TypeScript sources.
+
+Finds the modules a source loads (import/export ... from, side-effect imports, require() and
+dynamic import(), TypeScript's import x = require() included) and the classes it constructs with new, e.g. `new AWS.SQS()` or
+`new S3Client()`. re has no fast path for an alternation of keywords, so each keyword is
+located with bytes.find and the pattern for it is matched right there; that keeps the scan
+at memchr speed over the bulk of a source. Minified bundles are recognized from their line
+lengths and skipped: they are build output that inlines whatever they import.
+"""
+import re
+
+# `import x from "m"` and `export * from "m"` are matched at from: a string right after it only
+# occurs in those statements, and the clause before it needs no backtracking that way
+MODULE_STRING = rb"""\s*['"]([^'"\n]+)['"]"""
+FROM_PATTERN = re.compile(rb"from" + MODULE_STRING)
+IMPORT_PATTERN = re.compile(rb"import\s*\(?" + MODULE_STRING)
+REQUIRE_PATTERN = re.compile(rb"require\s*\(" + MODULE_STRING)
+CONSTRUCTOR_PATTERN = re.compile(rb"new\s+(?:[\w$]+\s*\.\s*)?([A-Z][\w$]*)\s*\(")
+
+# Keyword -> (pattern matched where it starts, whether the match is a module)
+KEYWORDS = {
+    b"from": (FROM_PATTERN, True),
+    b"import": (IMPORT_PATTERN, True),
+    b"require": (REQUIRE_PATTERN, True),
+    b"new": (CONSTRUCTOR_PATTERN, False),
+}
+# Bytes that continue an identifier, so a keyword right after one is part of a longer name
+IDENTIFIER_BYTES = frozenset(b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$.")
+
+# Sources whose first MINIFIED_SAMPLE_BYTES average longer lines than this are treated as minified
+MINIFIED_SAMPLE_BYTES = 64 * 1024
+MINIFIED_LINE_LENGTH = 500
+
+
+def is_minified(file_content):
+    sample = file_content[:MINIFIED_SAMPLE_BYTES]
+    newline = b"\n" if isinstance(sample, bytes) else "\n"
+    return len(sample) > MINIFIED_LINE_LENGTH and len(sample) / (sample.count(newline) + 1) > MINIFIED_LINE_LENGTH
+
+
+def package_name(module):
+    """npm package of a module specifier, None for relative paths and node: builtins."""
+    if module.startswith((".", "/", "node:")):
+        return None
+    parts = module.split("/", 2)
+    if module.startswith("@"):
+        return "/".join(parts[:2]) if len(parts) > 1 else None
+    return parts[0]
+
+
+def analyze_js_source(file_content):
+    """(modules, constructed classes) of a source as two sets of str, or None for a minified one."""
+    if isinstance(file_content, str):
+        file_content = file_content.encode("utf-8", "surrogateescape")
+    if is_minified(file_content):
+        return None
+    modules = set()
+    constructed = set()
+    for keyword, (pattern, is_module) in KEYWORDS.items():
+        position = file_content.find(keyword)
+        while position != -1:
+            if (position == 0 or file_content[position - 1] not in IDENTIFIER_BYTES) and (
+                    match := pattern.match(file_content, position)):
+                if is_module:
+                    modules.add(match.group(1).decode("utf-8", "replace"))
+                else:
+                    constructed.add(match.group(1).decode("ascii", "replace"))
+            position = file_content.find(keyword, position + len(keyword))
+    return modules, constructed
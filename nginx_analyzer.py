@@ -0,0 +1,193 @@
+"""nginx configuration analysis.
+
+tokens() splits a config the way nginx's lexer does (quoted strings, comments, ${variables}),
+parse() nests the directives into blocks and analyze_config() reports every upstream with its
+servers' ports and weights, the hosts proxy_pass sends to and the include patterns. Analyses
+are cached by content hash, so configs repeated across files and repos are parsed once.
+
+load_config() follows include directives on disk from a main config file:
+
+    python nginx_analyzer.py /etc/nginx/nginx.conf
+"""
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+from urllib.parse import urlsplit
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>\#[^\n]*)
+  | (?P<quoted>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')
+  | (?P<special>[;{}])
+  | (?P<word>(?:\$\{[^}\s]*\}|[^\s;{}"'])+)
+""", re.VERBOSE)
+
+DEFAULT_PORT = 80
+
+# Analyses keyed by content digest; cleared when it grows past this many configs
+MAX_CACHED_ANALYSES = 4096
+_analyses = {}
+
+
+class NginxSyntaxError(ValueError):
+    pass
+
+
+def tokens(text):
+    """Words, quoted strings (unquoted) and the ";", "{", "}" separators of a config."""
+    position = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        if match.start() != position:
+            break
+        position = match.end()
+        kind = match.lastgroup
+        if kind == "quoted":
+            yield "word", re.sub(r"\\(.)", r"\1", match.group()[1:-1])
+        elif kind in ("word", "special"):
+            yield kind, match.group()
+    if position != len(text):
+        raise NginxSyntaxError(f"unexpected character at offset {position}")
+
+
+def parse(text):
+    """Directives of a config as (name, arguments, block) triples; block is None for simple directives."""
+    root = []
+    stack = [root]
+    words = []
+    for kind, token in tokens(text):
+        if kind == "word":
+            words.append(token)
+        elif token == "}":
+            if words or len(stack) == 1:
+                raise NginxSyntaxError("unexpected }")
+            stack.pop()
+        elif not words:
+            raise NginxSyntaxError(f"{token} without a directive")
+        elif token == ";":
+            stack[-1].append((words[0], words[1:], None))
+            words = []
+        else:
+            block = []
+            stack[-1].append((words[0], words[1:], block))
+            stack.append(block)
+            words = []
+    if words or len(stack) != 1:
+        raise NginxSyntaxError("unexpected end of file")
+    return root
+
+
+def walk(directives):
+    for name, arguments, block in directives:
+        yield name, arguments, block
+        if block is not None:
+            yield from walk(block)
+
+
+def upstream_server(arguments):
+    """{"host", "port", "weight"} of the arguments of a server line inside an upstream block."""
+    address = arguments[0]
+    weight = 1
+    for parameter in arguments[1:]:
+        name, _, value = parameter.partition("=")
+        if name == "weight" and value.isdigit():
+            weight = int(value)
+    if address.startswith("unix:"):
+        return address, {"host": address, "port": None, "weight": weight}
+    # host, host:port, [ipv6] or [ipv6]:port
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit() or (":" in host and not host.endswith("]")):
+        host, port = address, DEFAULT_PORT
+    return address, {"host": host.strip("[]"), "port": int(port), "weight": weight}
+
+
+def proxy_pass_host(target):
+    """Lower-cased host a proxy_pass URL sends to, which is an upstream name when one is defined for it."""
+    if "://" not in target or "$" in target.split("://", 1)[1].split("/", 1)[0]:
+        # Not a URL, or a host only known at request time
+        return None
+    try:
+        return urlsplit(target).hostname or None
+    except ValueError:
+        return None
+
+
+def analyze_directives(directives):
+    upstreams = {}
+    proxy_passes = []
+    includes = []
+    for name, arguments, block in walk(directives):
+        if name == "upstream" and block is not None and arguments:
+            servers = upstreams.setdefault(arguments[0], {})
+            for server_name, server_arguments, _ in block:
+                if server_name == "server" and server_arguments:
+                    address, server = upstream_server(server_arguments)
+                    servers[address] = server
+        elif name == "proxy_pass" and arguments:
+            if (host := proxy_pass_host(arguments[0])) is not None and host not in proxy_passes:
+                proxy_passes.append(host)
+        elif name == "include" and arguments:
+            includes.append(arguments[0])
+    return {"upstreams": upstreams, "proxy_pass": proxy_passes, "includes": includes}
+
+
+def analyze_config(text):
+    """{"upstreams": {name: {address: {"host", "port", "weight"}}}, "proxy_pass": [host, ...], "includes": [...]}
+
+    Returns None when text is not an nginx config. The result is shared between callers
+    analyzing the same text and must not be modified.
+    """
+    digest = hashlib.blake2b(text.encode("utf-8", "surrogateescape"), digest_size=16).digest()
+    if digest in _analyses:
+        return _analyses[digest]
+    try:
+        analysis = analyze_directives(parse(text))
+    except NginxSyntaxError:
+        analysis = None
+    if len(_analyses) >= MAX_CACHED_ANALYSES:
+        _analyses.clear()
+    _analyses[digest] = analysis
+    return analysis
+
+
+def merge_analyses(analyses):
+    merged = {"upstreams": {}, "proxy_pass": [], "includes": []}
+    for analysis in analyses:
+        for name, servers in analysis["upstreams"].items():
+            merged["upstreams"].setdefault(name, {}).update(servers)
+        merged["proxy_pass"].extend(host for host in analysis["proxy_pass"] if host not in merged["proxy_pass"])
+        merged["includes"].extend(analysis["includes"])
+    return merged
+
+
+def load_config(path, prefix=None):
+    """Analysis of the config at path together with every file it includes, recursively.
+
+    Relative include patterns resolve against prefix (nginx's -p, by default the directory of
+    path) as nginx does; each file is read and analyzed once however often it is included.
+    """
+    prefix = prefix if prefix is not None else os.path.dirname(os.path.abspath(path))
+    analyses = []
+    seen = set()
+    pending = [os.path.abspath(path)]
+    while pending:
+        file_path = pending.pop(0)
+        if file_path in seen:
+            continue
+        seen.add(file_path)
+        with open(file_path, "r", encoding="utf-8", errors="surrogateescape") as file:
+            analysis = analyze_config(file.read())
+        if analysis is None:
+            continue
+        analyses.append(analysis)
+        for pattern in analysis["includes"]:
+            pending.extend(sorted(glob.glob(os.path.join(prefix, pattern))))
+    return merge_analyses(analyses)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        sys.exit(f"usage: {sys.argv[0]} NGINX_CONF [PREFIX]")
+    print(json.dumps(load_config(*sys.argv[1:]), indent=2))
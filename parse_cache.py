@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+DEFAULT_PARSE_CACHE_PATH = os.path.expanduser("~/.cache/github_discovery/parse_cache.sqlite3")
+
+
+def file_blob_sha(filepath, chunk_size=1024 * 1024):
+    # Same id git gives the file's content, so checkouts and git objects share cache entries
+    digest = hashlib.sha1(b"blob %d\0" % os.path.getsize(filepath))
+    with open(filepath, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """Persistent map of (parser version, parser, git blob sha) to the discovery fragment the parser produced."""
+
+    def __init__(self, path=DEFAULT_PARSE_CACHE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fragments ("
+            " parser_version INTEGER NOT NULL,"
+            " parser TEXT NOT NULL,"
+            " blob_sha TEXT NOT NULL,"
+            " fragment TEXT NOT NULL,"
+            " PRIMARY KEY (parser_version, parser, blob_sha))"
+        )
+
+    def get(self, parser_version, parser, blob_sha):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fragment FROM fragments WHERE parser_version = ? AND parser = ? AND blob_sha = ?",
+                (parser_version, parser, blob_sha),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, parser_version, parser, blob_sha, fragment):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fragments (parser_version, parser, blob_sha, fragment) VALUES (?, ?, ?, ?)",
+                (parser_version, parser, blob_sha, json.dumps(fragment)),
+            )
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self._conn.close()
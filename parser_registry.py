@@ -0,0 +1,155 @@
+"""Registry of the parsers discovery runs on repository files.
+
+Each parser declares file name globs and a target, the callable that parses a matching file as
+target(discovery, file_content) and records what it finds in discovery.services_discovered.
+A target given as a "module:attribute" string is imported the first time a matching file is seen.
+
+Installed packages add parsers through the "github_discovery.parsers" entry point group. The entry
+point name holds the comma separated globs and the value is the target, e.g. in pyproject.toml:
+
+    [project.entry-points."github_discovery.parsers"]
+    "*.tf" = "terraform_discovery.parser:parse_terraform"
+
+Reading entry points only reads package metadata, so no plugin module is imported at startup.
+"""
+import fnmatch
+import importlib
+import re
+import time
+
+ENTRY_POINT_GROUP = "github_discovery.parsers"
+
+GLOB_CHARS = set("*?[")
+
+
+class ParserSpec:
+    def __init__(self, name, patterns, target=None, fragment=None, reads_bytes=False, ignore_case=False,
+                 max_file_bytes=None, version=None):
+        self.name = name
+        self.patterns = patterns
+        self.target = target
+        # Files matched by a fragment-only spec contribute the fragment without being read
+        self.fragment = fragment
+        self.reads_bytes = reads_bytes
+        self.ignore_case = ignore_case
+        # Replaces the discovery's file size limit for matching files, e.g. for generated lockfiles
+        self.max_file_bytes = max_file_bytes
+        # Version of the code behind the target, for plugins the distribution's; built-in parsers
+        # are covered by discovery.PARSER_VERSION
+        self.version = version
+        self.calls = 0
+        self.seconds = 0.0
+        self.load_seconds = 0.0
+        self._function = target if callable(target) else None
+
+    @property
+    def is_parser(self):
+        return self.fragment is None
+
+    @property
+    def cache_key(self):
+        # Parse cache entries of a plugin parser are dropped with each release of the plugin
+        return self.name if self.version is None else f"{self.name}=={self.version}"
+
+    def load(self):
+        if self._function is None:
+            started = time.perf_counter()
+            module_name, _, attribute = self.target.partition(":")
+            function = importlib.import_module(module_name)
+            for part in attribute.split("."):
+                function = getattr(function, part)
+            self._function = function
+            self.load_seconds = time.perf_counter() - started
+        return self._function
+
+    def parse(self, discovery, file_content):
+        function = self.load()
+        started = time.perf_counter()
+        try:
+            function(discovery, file_content)
+        finally:
+            self.calls += 1
+            self.seconds += time.perf_counter() - started
+
+
+class ParserRegistry:
+    """Looks up the spec for a file name by exact name, extension, then any other glob.
+
+    Globs ending in a literal extension, like docker-compose.*.yml, are more specific than that
+    extension and are tried just before it. Within each kind of pattern the first registered spec wins.
+    """
+
+    def __init__(self, specs=(), entry_point_group=ENTRY_POINT_GROUP):
+        self.specs = {}
+        self._names = {}
+        self._lower_names = {}
+        self._extensions = {}
+        self._lower_extensions = {}
+        self._globs = []
+        # Lowercased extension -> [(compiled glob, spec)] of the globs ending in it
+        self._extension_globs = {}
+        self._entry_point_group = entry_point_group
+        for spec in specs:
+            self.register(spec)
+
+    def register(self, spec):
+        self.specs[spec.name] = spec
+        for pattern in spec.patterns:
+            if not GLOB_CHARS & set(pattern):
+                if spec.ignore_case:
+                    self._lower_names.setdefault(pattern.lower(), spec)
+                else:
+                    self._names.setdefault(pattern, spec)
+            elif pattern.startswith("*.") and not GLOB_CHARS & set(pattern[2:]) and "." not in pattern[2:]:
+                if spec.ignore_case:
+                    self._lower_extensions.setdefault(pattern[2:].lower(), spec)
+                else:
+                    self._extensions.setdefault(pattern[2:], spec)
+            else:
+                flags = re.IGNORECASE if spec.ignore_case else 0
+                glob = (re.compile(fnmatch.translate(pattern), flags), spec)
+                extension = pattern.rsplit(".", 1)[1] if "." in pattern else ""
+                if extension and not GLOB_CHARS & set(extension):
+                    self._extension_globs.setdefault(extension.lower(), []).append(glob)
+                else:
+                    self._globs.append(glob)
+        return spec
+
+    def load_entry_points(self):
+        if self._entry_point_group is None:
+            return
+        # importlib.metadata is slow to import, so it waits for the first lookup
+        import importlib.metadata
+        group, self._entry_point_group = self._entry_point_group, None
+        for entry_point in importlib.metadata.entry_points(group=group):
+            patterns = [pattern.strip() for pattern in entry_point.name.split(",") if pattern.strip()]
+            version = entry_point.dist.version if entry_point.dist is not None else None
+            self.register(ParserSpec(entry_point.value, patterns, entry_point.value, version=version))
+
+    def lookup(self, filename):
+        self.load_entry_points()
+        spec = self._names.get(filename) or self._lower_names.get(filename.lower())
+        if spec is None and "." in filename:
+            extension = filename.rsplit(".", 1)[1]
+            for pattern, glob_spec in self._extension_globs.get(extension.lower(), ()):
+                if pattern.match(filename):
+                    return glob_spec
+            spec = self._extensions.get(extension) or self._lower_extensions.get(extension.lower())
+        if spec is None:
+            for pattern, glob_spec in self._globs:
+                if pattern.match(filename):
+                    return glob_spec
+        return spec
+
+    def patterns(self):
+        self.load_entry_points()
+        patterns = []
+        for spec in self.specs.values():
+            patterns.extend(pattern for pattern in spec.patterns if pattern not in patterns)
+        return patterns
+
+    def timings(self):
+        return {
+            name: {"calls": spec.calls, "seconds": spec.seconds, "load_seconds": spec.load_seconds}
+            for name, spec in self.specs.items() if spec.is_parser
+        }
@@ -0,0 +1,127 @@
+import ast
+import re
+
+# Only sources mentioning one of these are worth parsing
+PREFILTER_TOKENS = ["boto3", "botocore", "redis", "pymongo", "psycopg2", "kafka", "pika"]
+PREFILTER_PATTERN = re.compile("|".join(PREFILTER_TOKENS))
+PREFILTER_BYTES_PATTERN = re.compile("|".join(PREFILTER_TOKENS).encode("ascii"))
+
+# Client libraries whose import is reported
+TRACKED_LIBRARIES = {"redis", "pymongo", "psycopg2", "kafka", "pika"}
+
+CLIENT_FACTORIES = {"client", "resource", "create_client"}
+SESSION_FACTORIES = {"boto3.Session", "boto3.session.Session", "botocore.session.get_session",
+                     "botocore.session.Session"}
+
+
+def passes_prefilter(file_content):
+    pattern = PREFILTER_PATTERN if isinstance(file_content, str) else PREFILTER_BYTES_PATTERN
+    return pattern.search(file_content) is not None
+
+
+class PythonSourceAnalyzer:
+    """Resolves imports, aliases and string constants of one module to find the services it uses.
+
+    analyze() returns a set of ("import", library) pairs for imported TRACKED_LIBRARIES and
+    ("boto3", service name) pairs for boto3/botocore clients, e.g. ("boto3", "s3").
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        # Local name -> dotted name it refers to; boto3/botocore resolve even when the import is missing
+        self.aliases = {"boto3": "boto3", "botocore": "botocore"}
+        self.constants = {}
+        self.sessions = set()
+
+    def analyze(self):
+        found = set()
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname:
+                        self.aliases[alias.asname] = alias.name
+                    else:
+                        top = alias.name.split(".")[0]
+                        self.aliases[top] = top
+                    found.update(self.library_services(alias.name))
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                for alias in node.names:
+                    self.aliases[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+                found.update(self.library_services(node.module))
+            elif isinstance(node, ast.Assign):
+                for target in node.targets:
+                    self.record_assignment(target, node.value)
+            elif isinstance(node, (ast.AnnAssign, ast.NamedExpr)) and node.value is not None:
+                self.record_assignment(node.target, node.value)
+
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Call) and (service := self.client_service(node)):
+                found.add(("boto3", service))
+        return found
+
+    @staticmethod
+    def library_services(module):
+        top = module.split(".")[0]
+        return {("import", top)} if top in TRACKED_LIBRARIES else set()
+
+    def record_assignment(self, target, value):
+        if not isinstance(target, ast.Name):
+            return
+        if (constant := self.fold(value)) is not None:
+            self.constants[target.id] = constant
+        elif isinstance(value, ast.Call) and self.qualified_name(value.func) in SESSION_FACTORIES:
+            self.sessions.add(target.id)
+
+    def fold(self, node):
+        # Constant-fold string literals, names bound to them and their concatenations
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Name):
+            return self.constants.get(node.id)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+            left, right = self.fold(node.left), self.fold(node.right)
+            if left is not None and right is not None:
+                return left + right
+        return None
+
+    def qualified_name(self, node):
+        if isinstance(node, ast.Name):
+            return self.aliases.get(node.id)
+        if isinstance(node, ast.Attribute) and (base := self.qualified_name(node.value)):
+            return f"{base}.{node.attr}"
+        return None
+
+    def client_service(self, call):
+        func = call.func
+        qualified = self.qualified_name(func)
+        if qualified in ("boto3.client", "boto3.resource"):
+            return self.service_argument(call)
+        if not isinstance(func, ast.Attribute) or func.attr not in CLIENT_FACTORIES:
+            return None
+        owner = func.value
+        if isinstance(owner, ast.Name) and owner.id in self.sessions:
+            return self.service_argument(call)
+        if isinstance(owner, ast.Call) and self.qualified_name(owner.func) in SESSION_FACTORIES:
+            return self.service_argument(call)
+        return None
+
+    def service_argument(self, call):
+        if call.args:
+            return self.fold(call.args[0])
+        for keyword in call.keywords:
+            if keyword.arg == "service_name":
+                return self.fold(keyword.value)
+        return None
+
+
+def analyze_python_source(file_content):
+    """What PythonSourceAnalyzer finds in a source (str or bytes-like); None when it doesn't parse."""
+    if not passes_prefilter(file_content):
+        return set()
+    if not isinstance(file_content, (str, bytes)):
+        file_content = bytes(file_content)
+    try:
+        tree = ast.parse(file_content)
+    except (SyntaxError, ValueError):
+        return None
+    return PythonSourceAnalyzer(tree).analyze()
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+DEFAULT_RENDER_CACHE_DIR = os.path.expanduser("~/.cache/github_discovery/diagrams")
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+def _canonical(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    raise TypeError(f"{type(value).__name__} is not part of a discovery")
+
+
+def discovery_fingerprint(customer, discovery, outformat, layout="graphviz"):
+    """Hash of everything a rendered diagram depends on; dict key order doesn't matter."""
+    import aws_dac_generator
+    from discovery_model import as_discovery
+    # Through the model, so results differing only in duplicates or list order share a diagram
+    canonical = json.dumps([aws_dac_generator.RENDERER_VERSION, outformat, layout, customer,
+                            as_discovery(discovery).to_dict()],
+                           sort_keys=True, separators=(",", ":"), default=_canonical)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Rendered diagrams keyed by discovery_fingerprint, so an unchanged architecture never reaches graphviz.
+
+    Lookups and bookkeeping happen in the calling process; only misses go to the render executor.
+    Diagrams are evicted least-recently-used first once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_RENDER_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def diagram_path(self, fingerprint, outformat):
+        return os.path.join(self.cache_dir, f"{fingerprint}.{outformat}")
+
+    def lookup(self, customer, discovery, outformats, layout="graphviz"):
+        """{format: cached path} when every format is cached, otherwise None."""
+        paths = {one_format: self.diagram_path(discovery_fingerprint(customer, discovery, one_format, layout), one_format)
+                 for one_format in outformats}
+        now = time.time()
+        try:
+            for path in paths.values():
+                os.utime(path, (now, now))
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self.hits += 1
+        return paths
+
+    def store(self, customer, discovery, rendered, layout="graphviz"):
+        """Move freshly rendered {format: path} files into the cache; returns their cached paths."""
+        paths = {}
+        for one_format, rendered_path in rendered.items():
+            paths[one_format] = self.diagram_path(discovery_fingerprint(customer, discovery, one_format, layout),
+                                                  one_format)
+            os.replace(rendered_path, paths[one_format])
+        with self._lock:
+            self.misses += 1
+        for path in paths.values():
+            self.evict(keep=path)
+        return paths
+
+    def submit(self, executor, customer, discovery, outformats, filename, layout="graphviz"):
+        """Future of {format: path} of the diagram placed at filename.<format>, rendered on executor on a miss."""
+        import aws_dac_generator
+        outformats = [outformats] if isinstance(outformats, str) else list(outformats)
+        future = Future()
+        if (cached := self.lookup(customer, discovery, outformats, layout)) is not None:
+            future.set_result(self.link(cached, filename))
+            return future
+        # Render next to the cache so a failed render never looks like a cached diagram
+        partial = tempfile.mkdtemp(prefix="partial-", dir=self.cache_dir)
+
+        def rendered(rendering):
+            try:
+                future.set_result(self.link(self.store(customer, discovery, rendering.result(), layout), filename))
+            except Exception as ex:
+                future.set_exception(ex)
+            finally:
+                shutil.rmtree(partial, ignore_errors=True)
+
+        executor.submit(aws_dac_generator.render_diagram, customer, discovery, os.path.join(partial, "diagram"),
+                        outformats, layout).add_done_callback(rendered)
+        return future
+
+    @staticmethod
+    def link(paths, filename):
+        """Place cached diagrams at filename.<format>; hard links, so eviction never takes them away."""
+        placed = {}
+        for one_format, path in paths.items():
+            placed[one_format] = f"{filename}.{one_format}"
+            if os.path.exists(placed[one_format]):
+                os.remove(placed[one_format])
+            try:
+                os.link(path, placed[one_format])
+            except OSError:
+                shutil.copyfile(path, placed[one_format])
+        return placed
+
+    def evict(self, keep=None):
+        with self._lock:
+            diagrams = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file():
+                    stat = entry.stat()
+                    diagrams.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in diagrams)
+            for _, size, path in sorted(diagrams):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                total -= size
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
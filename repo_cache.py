@@ -0,0 +1,134 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from git import Repo
+
+DEFAULT_MIRROR_DIR = os.path.expanduser("~/.cache/github_discovery/mirrors")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def directory_size(directory):
+    total = 0
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            file_path = os.path.join(root, filename)
+            if not os.path.islink(file_path):
+                total += os.path.getsize(file_path)
+    return total
+
+
+class RepoMirrorCache:
+    """Bare mirrors of remote repositories, keyed by a hash of the repository URL.
+
+    A miss clones a mirror, a hit only fetches new objects into the existing one.
+    Mirrors are evicted least-recently-used first once the cache grows past max_bytes, except
+    those held through mirror() or checkout(), so threads can share one cache.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_MIRROR_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        # Guards the counters, the holders and eviction
+        self._lock = threading.Lock()
+        # Mirror path -> number of callers reading it right now
+        self._holders = {}
+        # Mirror path -> lock letting one caller at a time clone or fetch it
+        self._update_locks = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def mirror_path(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.git")
+
+    def update_mirror(self, url):
+        """Fetch or clone the mirror of url and return its path.
+
+        The mirror may be evicted once this returns; hold it with mirror() while reading it.
+        """
+        with self.mirror(url) as path:
+            return path
+
+    @contextmanager
+    def mirror(self, url):
+        """Yield the path of the updated mirror of url, which is not evicted until the block exits."""
+        path = self.mirror_path(url)
+        with self._lock:
+            self._holders[path] = self._holders.get(path, 0) + 1
+            update_lock = self._update_locks.setdefault(path, threading.Lock())
+        try:
+            with update_lock:
+                self._update(url, path)
+            yield path
+        finally:
+            with self._lock:
+                self._holders[path] -= 1
+                if not self._holders[path]:
+                    del self._holders[path]
+
+    def _update(self, url, path):
+        if os.path.exists(path):
+            # Everything already in the mirror is data we don't download again
+            cached_bytes = directory_size(path)
+            Repo(path).git.fetch("--prune", "origin")
+            with self._lock:
+                self.hits += 1
+                self.bytes_saved += cached_bytes
+        else:
+            # Clone next to the final path so an interrupted clone never looks like a mirror
+            partial = tempfile.mkdtemp(prefix="partial-", dir=self.cache_dir)
+            try:
+                Repo.clone_from(url, partial, mirror=True)
+                os.rename(partial, path)
+            finally:
+                if os.path.exists(partial):
+                    shutil.rmtree(partial)
+            with self._lock:
+                self.misses += 1
+        now = time.time()
+        os.utime(path, (now, now))
+        self.evict(keep=path)
+
+    @contextmanager
+    def checkout(self, url):
+        """Yield a throwaway worktree of the mirror's HEAD; it is removed on exit."""
+        with self.mirror(url) as path:
+            mirror = Repo(path)
+            worktree = tempfile.mkdtemp(prefix="worktree-")
+            mirror.git.worktree("add", "--detach", "--force", worktree, "HEAD")
+            try:
+                yield worktree
+            finally:
+                mirror.git.worktree("remove", "--force", worktree)
+                if os.path.exists(worktree):
+                    shutil.rmtree(worktree)
+
+    def evict(self, keep=None):
+        with self._lock:
+            self._evict(keep)
+
+    def _evict(self, keep):
+        mirrors = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_dir() and entry.name.endswith(".git"):
+                mirrors.append((entry.stat().st_mtime, directory_size(entry.path), entry.path))
+        total = sum(size for _, size, _ in mirrors)
+        for _, size, path in sorted(mirrors):
+            if total <= self.max_bytes:
+                break
+            if path == keep or path in self._holders:
+                continue
+            shutil.rmtree(path)
+            total -= size
+            print(f"Evicted mirror {path}")
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes_saved": self.bytes_saved}
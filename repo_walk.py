@@ -0,0 +1,125 @@
+import fnmatch
+import os
+import re
+import time
+
+# Directories that never hold hand-written manifests or sources worth parsing
+DEFAULT_DENY_DIRS = frozenset({
+    ".git", ".hg", ".svn", "node_modules", "bower_components", "venv", ".venv", "env", "__pycache__",
+    ".tox", ".nox", ".mypy_cache", ".pytest_cache", ".idea", ".vscode", "build", "dist", "target",
+    "site-packages", ".terraform",
+})
+
+
+class GitignoreRules:
+    """Patterns of one .gitignore file, matched against paths relative to its directory."""
+
+    def __init__(self, lines):
+        self.rules = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if line.startswith("**/"):
+                line = line[3:]
+            # A slash anywhere but the end anchors the pattern to the .gitignore directory
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if not line:
+                continue
+            # fnmatch's * also crosses directories, which covers ** in the middle of a pattern
+            pattern = re.compile(fnmatch.translate(line))
+            self.rules.append((pattern, negated, dir_only, anchored))
+
+    @classmethod
+    def load(cls, directory):
+        try:
+            with open(os.path.join(directory, ".gitignore"), "r", encoding="utf-8", errors="replace") as file:
+                return cls(file)
+        except OSError:
+            return None
+
+    def match(self, relative_path, name, is_dir):
+        # None when no rule applies, otherwise whether the last matching rule ignores the path
+        ignored = None
+        for pattern, negated, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if pattern.match(relative_path if anchored else name):
+                ignored = not negated
+        return ignored
+
+
+def is_ignored(ignore_stack, path, name, is_dir):
+    ignored = False
+    for base, rules in ignore_stack:
+        matched = rules.match(os.path.relpath(path, base), name, is_dir)
+        if matched is not None:
+            ignored = matched
+    return ignored
+
+
+def walk_files(directory, deny_dirs=DEFAULT_DENY_DIRS, stats=None, use_gitignore=True):
+    """Yield (file path, file name) in os.walk order, pruning denied and git-ignored directories.
+
+    Uses os.scandir so file/directory checks come from the directory listing without extra stat calls.
+    """
+    if stats is None:
+        stats = new_walk_stats()
+    yield from timed(_walk(directory, deny_dirs, stats, [], use_gitignore), stats)
+
+
+def in_denied_dir(path, deny_dirs=DEFAULT_DENY_DIRS):
+    """Whether a /-separated repo path, such as a git tree path, lies under a denied directory."""
+    return any(part in deny_dirs for part in path.split("/")[:-1])
+
+
+def timed(items, stats):
+    """Yield from items, adding the time spent producing them to stats["walk_seconds"].
+
+    Time the consumer spends between items, parsing the files, is not counted.
+    """
+    items = iter(items)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(items)
+        except StopIteration:
+            return
+        finally:
+            stats["walk_seconds"] += time.perf_counter() - started
+        yield item
+
+
+def _walk(directory, deny_dirs, stats, ignore_stack, use_gitignore):
+    if use_gitignore and (rules := GitignoreRules.load(directory)) is not None:
+        ignore_stack = ignore_stack + [(directory, rules)]
+    subdirectories = []
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name in deny_dirs or is_ignored(ignore_stack, entry.path, entry.name, True):
+                stats["dirs_pruned"] += 1
+            else:
+                subdirectories.append(entry.path)
+        elif not entry.is_dir():
+            # Like os.walk, symlinked files are listed and symlinked directories are not descended into
+            if is_ignored(ignore_stack, entry.path, entry.name, False):
+                stats["files_ignored"] += 1
+                continue
+            stats["files_visited"] += 1
+            yield entry.path, entry.name
+    for subdirectory in subdirectories:
+        yield from _walk(subdirectory, deny_dirs, stats, ignore_stack, use_gitignore)
+
+
+def new_walk_stats():
+    return {"files_visited": 0, "files_ignored": 0, "files_skipped": 0, "dirs_pruned": 0, "walk_seconds": 0.0}